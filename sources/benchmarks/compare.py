@@ -0,0 +1,79 @@
+"""
+Compares two runs of benchmarks.suite
+Run from the sources folder with:
+    python -m benchmarks.compare before.json after.json [--threshold 10]
+Exits with 1 if a benchmark got slower than the threshold, so it can be used before a build
+"""
+
+import argparse
+import json
+import sys
+
+# Slowdown (in %) above which a benchmark is a regression
+THRESHOLD = 10.0
+
+# The fastest run is the least sensitive to the noise of the machine
+STAT = "min"
+
+
+def loadResults(path):
+    """
+    Returns the report of a run and its results keyed by (name, scale)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return report, {(r["name"], r["scale"]): r for r in report["results"]}
+
+
+def compare(before, after, threshold=THRESHOLD, stat=STAT):
+    """
+    Returns a list of (name, scale, before time, after time, change in %, status)
+    for the benchmarks present in both runs
+    stat: which timing to compare ("min", "median" or "mean")
+    """
+    rows = []
+    for key, new in after.items():
+        old = before.get(key)
+        if old is None:
+            continue
+        change = (new[stat] / old[stat] - 1) * 100 if old[stat] > 0 else 0.0
+        if change > threshold:
+            status = "SLOWER"
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = ""
+        rows.append((key[0], key[1], old[stat], new[stat], change, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares two benchmark runs")
+    parser.add_argument("before", help="results of the reference run")
+    parser.add_argument("after", help="results of the new run")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="slowdown in %% considered a regression")
+    parser.add_argument("--stat", choices=("min", "median", "mean"), default=STAT, help="timing compared")
+    args = parser.parse_args()
+
+    beforeReport, before = loadResults(args.before)
+    afterReport, after = loadResults(args.after)
+    print(f"[Compare] {args.before} ({beforeReport['meta'].get('commit')}) -> {args.after} ({afterReport['meta'].get('commit')})")
+
+    rows = compare(before, after, args.threshold, args.stat)
+    print(f"{'benchmark':<20} {'planets':>8} {'before (ms)':>12} {'after (ms)':>12} {'change':>8}   ({args.stat})")
+    for name, scale, old, new, change, status in rows:
+        print(f"{name:<20} {scale:>8} {old * 1000:12.3f} {new * 1000:12.3f} {change:+7.1f}% {status}")
+
+    missing = set(before) ^ set(after)
+    if missing:
+        print(f"[Compare] {len(missing)} benchmark(s) only in one of the runs, not compared")
+
+    regressions = [row for row in rows if row[5] == "SLOWER"]
+    if regressions:
+        print(f"[Compare] {len(regressions)} regression(s) above {args.threshold}%")
+        sys.exit(1)
+    print("[Compare] No regression")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark of the planet generation
+Run from the sources folder with:
+    python -m benchmarks.generation [count ...]
+"""
+
+import sys
+import time
+
+from entities.planet_store import PlanetStore
+from gameplay.generation import AnnulusDomain, generatePlanetField
+
+# Keep the same density as a new game (1200 planets over a spread of 80000)
+DEFAULT_COUNTS = [1200, 10000, 100000]
+
+
+def spreadFor(count):
+    return 80000 * (count / 1200) ** 0.5
+
+
+def benchGeneration(count, seed=0):
+    """
+    Returns the time (seconds) taken to generate "count" planets
+    """
+    spread = spreadFor(count)
+    store = PlanetStore(count)
+    start = time.perf_counter()
+    generatePlanetField(store, count, AnnulusDomain(spread * 0.1, spread), 300, seed=seed)
+    return time.perf_counter() - start
+
+
+def main(args):
+    counts = [int(a) for a in args] or DEFAULT_COUNTS
+    for count in counts:
+        elapsed = benchGeneration(count)
+        print(f"[Bench] generatePlanetField {count:>8} planets: {elapsed:.3f} s ({count / elapsed:,.0f} planets/s)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,221 @@
+"""
+Benchmark suite
+Measures the main paths of the game (generation, simulation, rendering, saves, quests)
+at several world sizes, and writes the results as JSON for benchmarks.compare
+Run from the sources folder with:
+    python -m benchmarks.suite [--scales 1000,10000] [--output results.json]
+The game runs headless in a temporary folder, the real save is never touched
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pygame
+
+from benchmarks.generation import spreadFor
+from gameplay.route_planner import RoutePlanner
+from headless import startGame
+from utils.save_manager import listSaves, loadSave, readJsonSave, saveGame, slotFile, snapshot, writeJsonSave
+from utils.save_format import readMeta
+from utils.kd_tree import KDTree
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+# Time spent repeating a measure, a single run is kept if it is longer than that
+TIME_BUDGET = 1.0
+MAX_RUNS = 50
+
+MIN_DISTANCE = 300
+
+# Radius of the planetsWithin benchmark
+NEAR_RADIUS = 5000
+
+# Quests of the route benchmarks
+ROUTE_QUESTS = 200
+
+
+def measure(fn, setup=None, budget=TIME_BUDGET, maxRuns=MAX_RUNS):
+    """
+    Runs fn until the time budget is spent, setup (not timed) runs before each call
+    Returns a dict of timings in seconds
+    """
+    times = []
+    total = 0.0
+    # The game logs a lot, keep the output of the suite readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        while len(times) < maxRuns and (not times or total < budget):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            times.append(elapsed)
+            total += elapsed
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "runs": len(times),
+    }
+
+
+def gitCommit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchScale(game, scale, budget):
+    """
+    Runs every benchmark on a world of "scale" planets
+    Returns a list of results
+    """
+    gs = game.gameScreen
+    rng = random.Random(scale)
+    results = []
+
+    def record(name, fn, setup=None):
+        result = {"name": name, "scale": scale, **measure(fn, setup, budget)}
+        print(f"[Bench] {name:<20} {scale:>8} planets: {result['median'] * 1000:10.3f} ms (median of {result['runs']})")
+        results.append(result)
+
+    # World
+    record("generatePlanets", lambda: gs.generatePlanets(scale, spreadFor(scale), MIN_DISTANCE, seed=0))
+    game.initQuestManager()
+
+    # Simulation and rendering, the ship flies over the planets
+    def moveShip():
+        planet = gs.planets[rng.randrange(len(gs.planets))]
+        gs.ship.pos = planet.pos + (500, 500)
+        gs.ship.resetInterpolation()
+
+    gs.ship.vel = pygame.Vector2(300, 200)
+    record("update", lambda: gs.update(game.timestep.dt), setup=moveShip)
+    surface = pygame.Surface((game.getWidth(), game.getHeight()))
+    record("render", lambda: gs.render(surface), setup=moveShip)
+
+    def staleMinimap():
+        moveShip()
+        gs.minimap.invalidate()
+
+    record("renderMinimap", lambda: gs.renderMinimap(surface, gs.zoom), setup=staleMinimap)
+
+    # Neighbour queries, the tree is rebuilt when the planets change
+    record("buildPlanetTree", lambda: KDTree(gs.planets, gs.planetIndex.revision))
+    record("nearestPlanets", lambda: gs.nearestPlanets(10), setup=moveShip)
+    record("nearestGiver", lambda: gs.nearestGiver(), setup=moveShip)
+    record("planetsWithin", lambda: gs.planetsWithin(NEAR_RADIUS), setup=moveShip)
+
+    # Saves
+    record("saveGame", lambda: saveGame(game))
+    record("loadSave", lambda: loadSave(game))
+    # What the menus read, without loading the world
+    record("readMeta", lambda: readMeta(slotFile(game.slot)))
+    record("listSaves", listSaves)
+    # The old gzipped JSON format, for comparison
+    record("saveGameJson", lambda: writeJsonSave("savegame.json.gz", snapshot(game)))
+    record("loadSaveJson", lambda: readJsonSave("savegame.json.gz"))
+
+    # Quests
+    planets = gs.planets
+    questManager = game.questManager
+
+    def pickPlanet():
+        planet = planets[rng.randrange(len(planets))]
+        planet.buttons = list(gs.buttons)
+        return planet
+
+    def pickGiver():
+        # Only givers can be asked for their quest
+        planet = pickPlanet()
+        while questManager.offerOf(planet) is None:
+            planet = pickPlanet()
+        return planet
+
+    # Quests are generated when a planet is asked for one, the first time
+    record("offerQuest", lambda: questManager.offerOf(pickPlanet()))
+    record("checkPlanetIsGiver", lambda: questManager.checkPlanetIsGiver(pickPlanet()))
+    record("acceptQuest", lambda: questManager.acceptQuest(pickGiver()))
+    record("nearestTarget", lambda: gs.nearestTarget(), setup=moveShip)
+    data = questManager.toDict()
+    record("questsFromDict", lambda: questManager.fromDict(data))
+
+    # Routes over random quests (pickups included), from scratch and one quest at a time
+    route = {}
+
+    def randomQuests():
+        route["pairs"] = [
+            (planets.positions[rng.randrange(len(planets))], planets.positions[rng.randrange(len(planets))])
+            for _ in range(ROUTE_QUESTS)
+        ]
+
+    def planRoute():
+        planner = RoutePlanner(gs.ship.pos)
+        for i, (source, destination) in enumerate(route["pairs"]):
+            planner.addQuest(i, source, destination, improve=False)
+        planner.plan()
+        route["planner"] = planner
+
+    def settledRoute():
+        randomQuests()
+        planRoute()
+        route["planner"].improve(budget=1.0)
+
+    record("planRoute", planRoute, setup=randomQuests)
+    record("addQuestToRoute", lambda: route["planner"].addQuest(-1, *route["pairs"][0]), setup=settledRoute)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the benchmarks of the game")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                        help="comma separated planet counts, 1000000 works but takes a while")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the results")
+    parser.add_argument("--budget", type=float, default=TIME_BUDGET, help="seconds spent on each measure")
+    args = parser.parse_args()
+    scales = [int(s) for s in args.scales.split(",")]
+    output = os.path.abspath(args.output)
+    commit = gitCommit()
+
+    # Saves are written in the current folder
+    os.chdir(tempfile.mkdtemp(prefix="spacegame-bench-"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = startGame()
+
+    results = []
+    for scale in scales:
+        results.extend(benchScale(game, scale, args.budget))
+
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "budget": args.budget,
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[Bench] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Name registry
+Keeps the names of the planets of a store unique and interned,
+a name already taken gets a number ("Tyno" -> "Tyno XIV").
+The number comes from the id of the planet, so a planet removed then added again
+(streamed universe) gets back the name it had unless another planet took it meanwhile.
+Removed planets are forgotten, their chunk gives them the same name when it comes back,
+so the registry only holds the planets of the store.
+Planets are identified by their id, names are only shown to the player
+"""
+
+import sys
+
+ROMAN_NUMERALS = (
+    (1000, "M"), (900, "CM"), (500, "D"), (400, "CD"),
+    (100, "C"), (90, "XC"), (50, "L"), (40, "XL"),
+    (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I"),
+)
+
+# Numbers given to the names already taken, from II to that
+MAX_NUMBER = 99
+
+
+def toRoman(number):
+    text = ""
+    for value, numeral in ROMAN_NUMERALS:
+        count, number = divmod(number, value)
+        text += numeral * count
+    return text
+
+
+# Numerals of the numbers derived from the ids, computed once
+NUMERALS = {number: toRoman(number) for number in range(2, MAX_NUMBER + 1)}
+
+
+class NameRegistry:
+    def __init__(self):
+        # name -> id of the planet that has it
+        self.owners = {}
+        # name -> next number above MAX_NUMBER, for the names whose numbers are all taken
+        self._overflow = {}
+
+    def __len__(self):
+        return len(self.owners)
+
+    def _isFree(self, name, id):
+        owner = self.owners.get(name)
+        return owner is None or owner == id
+
+    def unique(self, name, id):
+        """
+        Returns the name the planet id gets for name:
+        name if it is free, else name with a number derived from the id
+        """
+        if self._isFree(name, id):
+            return name
+        span = MAX_NUMBER - 1
+        if name not in self._overflow:
+            for step in range(span):
+                numbered = f"{name} {NUMERALS[2 + (id + step) % span]}"
+                if self._isFree(numbered, id):
+                    return numbered
+            # Every number is taken, until one of them is released
+            self._overflow[name] = MAX_NUMBER + 1
+        number = self._overflow[name]
+        while not self._isFree(f"{name} {toRoman(number)}", id):
+            number += 1
+        self._overflow[name] = number
+        return f"{name} {toRoman(number)}"
+
+    def register(self, name, id):
+        """
+        Gives a unique version of name to the planet id and returns it
+        """
+        given = sys.intern(self.unique(name, id))
+        self.owners[given] = id
+        return given
+
+    def release(self, name):
+        """
+        Frees the name of a removed planet
+        Only the planets of unmodified chunks are ever removed (see Universe.update),
+        they are regenerated from the seed with the same name, so nothing is kept for them
+        """
+        self.owners.pop(name, None)
+        # A number of that name may be free again
+        self._overflow.pop(name.rsplit(" ", 1)[0], None)
+
+    def find(self, name):
+        """
+        Returns the id of the planet with that name, None if there is none
+        """
+        return self.owners.get(name)
@@ -3,6 +3,7 @@ import random
 import pygame
 from pygame.typing import RectLike
 
+from rendering.planet_sprites import drawPlanet
 from ui.button import Button
 
 
@@ -22,72 +23,110 @@ PLANET_TYPE = {
     },
 }
 
+# Type ids used by the PlanetStore, the index in this list is the id
+PLANET_TYPE_IDS = list(PLANET_TYPE.keys())
+
+# Syllables used to generate planet names
+NAME_SYLLABLES = [
+    "ty",
+    "no",
+    "li",
+    "ge",
+    "new",
+    "ven",
+    "tura",
+    "ex",
+    "treme",
+    "dra",
+    "cula",
+    "zyr",
+    "pha",
+    "phyr",
+    "mir",
+    "bit",
+    "ye",
+    "xe",
+    "cy",
+    "ber",
+]
+
+
 class Planet:
-    def __init__(self, pos, radius, color, name=None, planetType=None):
+    """
+    A planet is a lightweight view over one row of a PlanetStore
+    The store holds the data (position, radius, color...),
+    the view only holds the UI state of the planet
+    """
+    __slots__ = (
+        "store",
+        "index",
+        "showOverlay",
+        "availableQuests",
+        "inRange",
+        "optionalText",
+        "buttons",
+    )
+
+    def __init__(self, store, index):
         """
-        pos    : pygame.Vector2 in world coordinates
-        radius : radius in pixels
-        color  : RGB tuple
+        store : the PlanetStore holding the data
+        index : row of the planet in the store
         """
-        self.pos = pygame.Vector2(pos)
-        self.radius = radius
-        self.color = color
+        self.store = store
+        self.index = index
         self.showOverlay = False
         self.availableQuests = []
         self.inRange = False
-        self.name = name if name else self.generateName()
-        self.planetType = planetType or "rocky"
         self.optionalText = ""
         self.buttons = []
 
-    def generateName(self):
-        self.letters = [
-            "ty",
-            "no",
-            "li",
-            "ge",
-            "new",
-            "ven",
-            "tura",
-            "ex",
-            "treme",
-            "dra",
-            "cula",
-            "zyr",
-            "pha",
-            "phyr",
-            "mir",
-            "bit",
-            "ye",
-            "xe",
-            "cy",
-            "ber",
-        ]
-        self.name = random.choice(self.letters).capitalize() + random.choice( self.letters )
-        if random.random() < 0.4:
-            self.name += f"-{random.randint(1, 99)}"
-        return self.name
-
-    def render(self, surface, cameraOffset, zoom):
-        self.screenPos = (self.pos - cameraOffset) * zoom
-        self.screenRadius = int(self.radius * zoom)
-        if self.screenRadius > 1:
-            if self.inRange:
-                self.haloRadius = self.screenRadius + 10
-                self.haloColor = (255, 255, 120)
-                pygame.draw.circle(
-                    surface,
-                    self.haloColor,
-                    (int(self.screenPos.x), int(self.screenPos.y)),
-                    self.haloRadius,
-                    width=3,
-                )
-            pygame.draw.circle(
-                surface,
-                self.color,
-                (int(self.screenPos.x), int(self.screenPos.y)),
-                self.screenRadius,
-            )
+    #===========
+    #= Getters =
+    #===========
+    @property
+    def pos(self):
+        """pygame.Vector2 in world coordinates"""
+        return pygame.Vector2(self.store.positions[self.index])
+
+    @property
+    def radius(self):
+        """radius in pixels"""
+        return int(self.store.radii[self.index])
+
+    @property
+    def color(self):
+        """RGB tuple"""
+        return tuple(int(c) for c in self.store.colors[self.index])
+
+    @property
+    def id(self):
+        """stable id, what saves and quests refer to"""
+        return int(self.store.ids[self.index])
+
+    @property
+    def name(self):
+        return self.store.names[self.index]
+
+    @property
+    def planetType(self):
+        return PLANET_TYPE_IDS[self.store.typeIds[self.index]]
+
+    @staticmethod
+    def generateName(rng=random):
+        name = rng.choice(NAME_SYLLABLES).capitalize() + rng.choice(NAME_SYLLABLES)
+        if rng.random() < 0.4:
+            name += f"-{rng.randint(1, 99)}"
+        return name
+
+    def render(self, surface, camera):
+        """
+        Draws the planet
+        surface: the pygame surface to draw to
+        camera: the Camera to draw with
+        """
+        screenRadius = camera.scale(self.radius)
+        if screenRadius > 1:
+            drawPlanet(surface, self.color, camera.toScreen(self.pos), screenRadius, self.inRange)
 
     def collidePoints(self, point, margin=0) -> bool:
         p = pygame.Vector2(point)
@@ -100,15 +139,16 @@ class Planet:
             "radius": self.radius,
             "color": list(self.color),
             "name": self.name,
+            "planetType": self.planetType,
+            "id": self.id,
         }
 
     @classmethod
-    def fromDict(cls, data):
-        pos = pygame.Vector2(data["pos"])
-        radius = data["radius"]
-        color = tuple(data["color"])
-        name = data.get("name")
-        p = cls(pos, radius, color, name=name)
+    def fromDict(cls, data, store):
+        """
+        Adds the planet described by data to the store and returns its view
+        """
+        p = store.add(data["pos"], data["radius"], tuple(data["color"]), data.get("name"), data.get("planetType"), data.get("id"))
         p.showOverlay = data.get("showOverlay", False)
         return p
 
@@ -116,8 +156,8 @@ class Planet:
         return [(self.pos.x, self.pos.y), self.radius, self.color, self.name]
 
     @staticmethod
-    def fromSaveData(data):
-        return Planet(data[0], data[1], data[2], data[3])
+    def fromSaveData(data, store):
+        return store.add(data[0], data[1], data[2], data[3])
 
     def renderOverlay(self, surface, font, rect):
         if not self.showOverlay:
@@ -125,13 +165,13 @@ class Planet:
         pygame.draw.rect(surface, (30, 30, 60), rect)
         pygame.draw.rect(surface, (200, 200, 255), rect, 3)
 
-        self.title = font.render("Name: " + self.name, True, (255, 255, 255))
-        surface.blit(self.title, (rect.x + 20, rect.y + 20))
-        self.planetTypeText = font.render("Type: " + self.planetType, True, (255, 255, 255))
-        surface.blit(self.planetTypeText, (rect.x + 20, rect.y + 40))
+        title = font.render("Name: " + self.name, True, (255, 255, 255))
+        surface.blit(title, (rect.x + 20, rect.y + 20))
+        planetTypeText = font.render("Type: " + self.planetType, True, (255, 255, 255))
+        surface.blit(planetTypeText, (rect.x + 20, rect.y + 40))
         surface.blit(font.render(self.optionalText, True, (255, 255, 255)), (rect.x + 20, rect.y + 60))
-        self.tips = font.render(" Press C to close ", True, (100, 100, 100))
-        surface.blit(self.tips, (rect.x + 400, rect.y + 20))
+        tips = font.render(" Press C to close ", True, (100, 100, 100))
+        surface.blit(tips, (rect.x + 400, rect.y + 20))
         if len(self.buttons) != 0:
           for btn in self.buttons:
             btn.render(surface)
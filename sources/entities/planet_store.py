@@ -0,0 +1,349 @@
+"""
+Planet store
+Keeps every planet of the universe in contiguous NumPy arrays (structure of arrays),
+so that per-frame queries are a handful of vectorized operations
+instead of a Python loop over every planet
+"""
+
+import numpy as np
+
+from entities.name_registry import NameRegistry
+from entities.planet import PLANET_TYPE_IDS, Planet
+
+
+class PlanetStore:
+    def __init__(self, capacity=1024):
+        """
+        capacity: number of rows allocated up front, the arrays grow when full
+        """
+        self.count = 0
+        self.positions = np.zeros((capacity, 2), dtype=np.float64)
+        self.radii = np.zeros(capacity, dtype=np.float64)
+        self.colors = np.zeros((capacity, 3), dtype=np.uint8)
+        self.typeIds = np.zeros(capacity, dtype=np.uint8)
+        # Stable id of every planet, saves and quests refer to planets by id
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.names = []
+        # Id given to the next planet added without one
+        self.nextId = 0
+        # Views are only created for the planets we actually touch
+        self._views = {}
+        # Unique names (built on demand for the stores read from a save)
+        self._registry = None
+        # id -> row, built on demand when the ids are not the rows
+        self._idIndex = None
+        # Save file the arrays are read from, if any (see fromArrays)
+        self.mapping = None
+
+    #============
+    #= Sequence =
+    #============
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """
+        Returns the Planet view of a row, always the same object for the same row
+        """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("planet index out of range")
+        view = self._views.get(index)
+        if view is None:
+            view = self._views[index] = Planet(self, index)
+        return view
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    #============
+    #= Building =
+    #============
+    def _reserve(self, needed):
+        """
+        Grows the arrays (doubling) so they can hold at least "needed" rows
+        """
+        capacity = len(self.radii)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.positions = np.resize(self.positions, (capacity, 2))
+        self.radii = np.resize(self.radii, capacity)
+        self.colors = np.resize(self.colors, (capacity, 3))
+        self.typeIds = np.resize(self.typeIds, capacity)
+        self.ids = np.resize(self.ids, capacity)
+
+    def add(self, pos, radius, color, name=None, planetType=None, id=None):
+        """
+        Appends a planet and returns its view
+        pos    : world position
+        radius : radius in pixels
+        color  : RGB tuple
+        id     : stable id of the planet, the next free one if None
+        """
+        return self[self.extend(
+            [(pos[0], pos[1])],
+            [radius],
+            [color],
+            [PLANET_TYPE_IDS.index(planetType or "rocky")],
+            [name if name else Planet.generateName()],
+            None if id is None else [id],
+        )[0]]
+
+    def extend(self, positions, radii, colors, typeIds, names, ids=None):
+        """
+        Appends many planets at once, all arguments are parallel sequences
+        Names already taken get a number, see NameRegistry
+        ids: stable ids of the planets, the next free ones if None
+        Returns the range of the new rows
+        """
+        n = len(names)
+        start = self.count
+        self._reserve(self.count + n)
+        self._ownNames()
+        registry = self.registry()
+        if ids is None:
+            ids = np.arange(self.nextId, self.nextId + n)
+        rows = slice(self.count, self.count + n)
+        self.positions[rows] = positions
+        self.radii[rows] = radii
+        self.colors[rows] = colors
+        self.typeIds[rows] = typeIds
+        self.ids[rows] = ids
+        self.names.extend(registry.register(name, id) for name, id in zip(names, self.ids[rows].tolist()))
+        self.count += n
+        if n:
+            self.nextId = max(self.nextId, int(self.ids[rows].max()) + 1)
+        self._idIndex = None
+        return range(start, self.count)
+
+    def remove(self, rows):
+        """
+        Removes planets, the last rows are moved into the holes to keep the arrays dense
+        The views of removed planets are detached (they keep working on a copy),
+        the views of moved planets follow their row
+        Returns the list of (oldRow, newRow) moves, in the order they were done
+        """
+        moves = []
+        self._ownNames()
+        registry = self.registry()
+        for row in sorted(rows, reverse=True):
+            self._detach(row)
+            registry.release(self.names[row])
+            last = self.count - 1
+            if row != last:
+                self.positions[row] = self.positions[last]
+                self.radii[row] = self.radii[last]
+                self.colors[row] = self.colors[last]
+                self.typeIds[row] = self.typeIds[last]
+                self.ids[row] = self.ids[last]
+                self.names[row] = self.names[last]
+                view = self._views.pop(last, None)
+                if view is not None:
+                    view.index = row
+                    self._views[row] = view
+                moves.append((last, row))
+            self.names.pop()
+            self.count -= 1
+        self._idIndex = None
+        return moves
+
+    def _detach(self, row):
+        """
+        Moves the view of a row (if any) to its own one planet store
+        """
+        view = self._views.pop(row, None)
+        if view is None:
+            return
+        copy = PlanetStore(1)
+        copy.extend(
+            self.positions[row : row + 1],
+            self.radii[row : row + 1],
+            self.colors[row : row + 1],
+            self.typeIds[row : row + 1],
+            [self.names[row]],
+            self.ids[row : row + 1],
+        )
+        view.store = copy
+        view.index = 0
+        copy._views[0] = view
+
+    def _ownNames(self):
+        """
+        Names read from a save are decoded on demand, they become a list before any change
+        """
+        if not isinstance(self.names, list):
+            self.names = list(self.names)
+
+    def registry(self):
+        """
+        Returns the NameRegistry of the store, built from the names the first time
+        (saves of older versions can have the same name twice, the later ones get a number)
+        """
+        if self._registry is None:
+            registry = NameRegistry()
+            renamed = {}
+            for row, (name, id) in enumerate(zip(self.names, self.ids[: self.count].tolist())):
+                unique = registry.register(name, id)
+                if unique != name:
+                    renamed[row] = unique
+            if renamed:
+                self._ownNames()
+                for row, name in renamed.items():
+                    self.names[row] = name
+            self._registry = registry
+        return self._registry
+
+    @classmethod
+    def fromArrays(cls, positions, radii, colors, typeIds, names, ids, mapping=None):
+        """
+        Wraps existing arrays without copying them, all of them are full
+        The names must be unique, the registry is only built when needed
+        mapping: the mmap of the save file the arrays are views of,
+        its pages are only read when the planets are used
+        """
+        store = cls(1)
+        store.count = len(radii)
+        store.positions = positions
+        store.radii = radii
+        store.colors = colors
+        store.typeIds = typeIds
+        store.ids = ids
+        store.names = names
+        store.nextId = int(ids.max()) + 1 if len(ids) else 0
+        store.mapping = mapping
+        return store
+
+    def unmap(self):
+        """
+        Copies the rows mapped from a save file in memory,
+        so the file can be replaced by a new save
+        """
+        if self.mapping is None:
+            return
+        n = self.count
+        self.positions = np.array(self.positions[:n])
+        self.radii = np.array(self.radii[:n])
+        self.colors = np.array(self.colors[:n])
+        self.typeIds = np.array(self.typeIds[:n])
+        self.ids = np.array(self.ids[:n])
+        self._ownNames()
+        # Closed by the garbage collector once no array uses it
+        self.mapping = None
+
+    def copy(self):
+        """
+        Returns a new store with a copy of the rows (without the views),
+        cheap enough to snapshot the universe before saving it on another thread
+        """
+        n = self.count
+        return PlanetStore.fromArrays(
+            self.positions[:n].copy(),
+            self.radii[:n].copy(),
+            self.colors[:n].copy(),
+            self.typeIds[:n].copy(),
+            list(self.names),
+            self.ids[:n].copy(),
+        )
+
+    @classmethod
+    def fromDicts(cls, planets):
+        """
+        Builds a store from a list of Planet.toDict() dicts (save files)
+        """
+        store = cls(max(1, len(planets)))
+        for data in planets:
+            Planet.fromDict(data, store)
+        return store
+
+    #===========
+    #= Lookups =
+    #===========
+    def findById(self, id):
+        """
+        Returns the view of the planet with that id, None if there is none
+        """
+        row = self.rowOf(id)
+        return None if row is None else self[row]
+
+    def rowOf(self, id):
+        """
+        Returns the row of the planet with that id, None if there is none (no view is created)
+        """
+        # Planets of a generated field have their row as id
+        if 0 <= id < self.count and self.ids[id] == id:
+            return id
+        if self._idIndex is None:
+            self._idIndex = {planetId: row for row, planetId in enumerate(self.ids[: self.count].tolist())}
+        return self._idIndex.get(id)
+
+    def findByName(self, name, row=None):
+        """
+        Returns the view of the planet with that name, None if there is none
+        row: where the planet should be (from a save), checked before looking it up
+        """
+        if row is not None and 0 <= row < self.count and self.names[row] == name:
+            return self[row]
+        id = self.registry().find(name)
+        return None if id is None else self.findById(id)
+
+    #======================
+    #= Vectorized queries =
+    #======================
+    def distancesSq(self, point, indices=None):
+        """
+        Returns the squared distances from a point to the planets centers
+        indices: rows to look at, every planet if None
+        """
+        pos = self.positions[: self.count] if indices is None else self.positions[indices]
+        delta = pos - (point[0], point[1])
+        return np.einsum("ij,ij->i", delta, delta)
+
+    def anyWithin(self, point, distance):
+        """
+        True if a planet surface is closer than "distance" to the point
+        """
+        if self.count == 0:
+            return False
+        reach = distance + self.radii[: self.count]
+        return bool(np.any(self.distancesSq(point) < reach * reach))
+
+    def withinRadius(self, point, radius, indices=None):
+        """
+        Returns the rows (array) of the planets whose disc overlaps the circle (point, radius)
+        """
+        if indices is None:
+            indices = np.arange(self.count)
+        reach = radius + self.radii[indices]
+        return indices[self.distancesSq(point, indices) < reach * reach]
+
+    def inRect(self, left, top, width, height, indices=None):
+        """
+        Returns the rows (array) of the planets whose disc overlaps a world rectangle
+        """
+        if indices is None:
+            indices = np.arange(self.count)
+        pos = self.positions[indices]
+        r = self.radii[indices]
+        mask = (
+            (pos[:, 0] >= left - r)
+            & (pos[:, 0] <= left + width + r)
+            & (pos[:, 1] >= top - r)
+            & (pos[:, 1] <= top + height + r)
+        )
+        return indices[mask]
+
+    def project(self, indices, offset, zoom):
+        """
+        World to screen projection of a set of planets
+        Returns (xs, ys, radii) as integer arrays
+        """
+        screen = (self.positions[indices] - (offset[0], offset[1])) * zoom
+        return (
+            screen[:, 0].astype(np.int64),
+            screen[:, 1].astype(np.int64),
+            (self.radii[indices] * zoom).astype(np.int64),
+        )
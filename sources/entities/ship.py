@@ -2,6 +2,8 @@ import math
 
 import pygame
 
+from rendering.sprite_cache import SpriteCache
+
 
 class ShipControls:
     """
@@ -46,6 +48,7 @@ class Ship:
         self.brand = brand
         self.rank = rank
         self.sprite = sprite
+        self.spriteCache = SpriteCache(sprite, name)
         self.acceleration = accel
         self.maxSpeed = maxSpeed
         self.drag = drag
@@ -56,6 +59,9 @@ class Ship:
         self.pos = pygame.Vector2(0, 0)
         self.vel = pygame.Vector2(0, 0)
         self.angle = 90.0
+        # State before the last update, used to interpolate the rendering
+        self.prevPos = pygame.Vector2(self.pos)
+        self.prevAngle = self.angle
 
 
     #===========
@@ -82,12 +88,16 @@ class Ship:
     def getSprite(self):
         return self.sprite
 
+    def getSpriteCache(self):
+        return self.spriteCache
+
     def update(self, dt, controls):
         """
         Update the ship from controllers inputs
         dt: Delta Time
         controls: A ShipControls object who has the inputs
         """
+        self.resetInterpolation()
         if controls.turnLeft:
             self.angle -= self.turnSpeed * dt
         if controls.turnRight:
@@ -122,14 +132,33 @@ class Ship:
 
         self.pos += self.vel * dt
 
-    def render(self, surface, camera_offset, zoom):
+    def resetInterpolation(self):
+        """
+        Forgets the previous state, for when the ship did not move or was teleported
+        """
+        self.prevPos.update(self.pos)
+        self.prevAngle = self.angle
+
+    def interpolated(self, alpha):
+        """
+        Returns the (pos, angle) between the previous and the current state
+        alpha: 0 is the previous state, 1 the current one
+        """
+        pos = self.prevPos.lerp(self.pos, alpha)
+        # Turn the shortest way, the angle wraps at 360
+        turn = (self.angle - self.prevAngle + 180) % 360 - 180
+        return pos, (self.prevAngle + turn * alpha) % 360
+
+    def render(self, surface, camera_offset, zoom, alpha=1.0):
         """
         Display the ship to the screen
         surface: The pygame surface to display to
         camera_offset: the offset of the camera
         zoom: current zoom, used to scale the sprite
+        alpha: where to draw the ship between its previous and current state
         """
-        screen_pos = (self.pos - camera_offset) * zoom
-        img = pygame.transform.rotozoom(self.sprite, -self.angle + 90, zoom)
+        pos, angle = self.interpolated(alpha)
+        screen_pos = (pos - camera_offset) * zoom
+        img = self.spriteCache.get(angle, zoom)
         rect = img.get_rect(center=screen_pos)
         surface.blit(img, rect)
@@ -23,6 +23,7 @@
           packages = with pkgs; [
             python
 	          python.pkgs.pygame
+	          python.pkgs.numpy
           ];
 
           shellHook = ''
@@ -17,20 +17,29 @@ class Quest:
       Sets a little bit of context for a quest
       All operations are done by the manager
     """
-    self.objective = str(objective) + " from " + str(giver.name) + " for " + str(reward)
+    self.action    = str(objective) # The names of the planets are added when it is shown, see describe
     self.giver     = giver
     self.receiver  = receiver
     self.reward    = reward
     self.id        = id
     self.completed = False
+    self.epoch     = 0 # Refresh period the giver offered it in (see QuestManager.epoch)
+
+  def describe(self, nameOf):
+    """
+    Returns the objective text
+    nameOf: returns the name a planet has now (names can change when chunks are reloaded)
+    """
+    return self.action + " from " + str(nameOf(self.giver)) + " for " + str(self.reward)
 
   def toDict(self):
     return {
         "id": self.id,
         "completed": self.completed,
         "reward": self.reward,
-        "giver": self.giver.name,
+        "giverId": self.giver.id,
         "receiver": None,
+        "epoch": self.epoch,
     }
 
   @classmethod
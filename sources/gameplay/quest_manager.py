@@ -1,9 +1,23 @@
 import random
+
+import numpy as np
+
 from gameplay.quests.delivery import DeliveryQuest
 from gameplay.quest import Quest
+from gameplay.route_planner import RoutePlanner
+from gameplay.universe import CHUNK_SIZE, chunkOfId
 from entities.planet import Planet
 import pygame
 
+# Seconds of play after which the planets offer new quests
+QUEST_REFRESH_TIME = 600.0
+
+# Destinations are picked among the planets that close to the giver,
+# loaded or not (see Universe.planetsAround)
+DELIVERY_RANGE = CHUNK_SIZE
+
+DELIVERY_REWARD = 10
+
 class QuestManager:
 
   def __init__(self, game):
@@ -11,8 +25,59 @@ class QuestManager:
     Has access to the whole game context
     """
     self.game = game
-    self.questList = []
+    # Accepted quests (completed or not) by id, in the order they were accepted
+    # Only those are saved, the others are generated again when needed
+    self.quests = {}
+    # Indexes of self.quests, kept up to date by addQuest and removeQuest
+    self.byGiver = {} # giver planet id -> quest
+    self.byDestination = {} # destination planet id -> {id: quest}
+    # Quests offered by the planets during self.offersEpoch, generated on demand
+    self.offers = {} # giver planet id -> quest, None if the planet has none
+    self.offersEpoch = None
+    # Order of the dropoffs of the active quests (accepted, not completed)
+    self.route = RoutePlanner()
+    # Quest of the next stop of the route, the one the HUD and the radar show
     self.currentQuest = None
+    self.nextId = 0
+
+  @property
+  def questList(self):
+    return list(self.quests.values())
+
+  #===========
+  #= Indexes =
+  #===========
+  def addQuest(self, quest):
+    self.quests[quest.id] = quest
+    self.byGiver[quest.giver.id] = quest
+    self.byDestination.setdefault(quest.destination.id, {})[quest.id] = quest
+
+  def removeQuest(self, quest):
+    del self.quests[quest.id]
+    if self.byGiver.get(quest.giver.id) is quest:
+      del self.byGiver[quest.giver.id]
+    targets = self.byDestination[quest.destination.id]
+    del targets[quest.id]
+    if not targets:
+      del self.byDestination[quest.destination.id]
+
+  def getQuest(self, id):
+    """
+    Returns the quest with that id, None if there is none
+    """
+    return self.quests.get(id)
+
+  def questsTo(self, planet):
+    """
+    Returns the quests whose destination is that planet
+    """
+    return list(self.byDestination.get(planet.id, {}).values())
+
+  def activeQuests(self):
+    """
+    Returns the accepted quests that are not completed yet
+    """
+    return [quest for quest in self.quests.values() if not quest.completed]
 
   def getActiveQuest(self):
     """
@@ -22,7 +87,19 @@ class QuestManager:
     """
     if self.currentQuest is None:
       return "No active quest"
-    return self.currentQuest.objective
+    objective = self.currentQuest.describe(self.nameOf)
+    others = len(self.route.questOrder()) - 1
+    if others > 0:
+      return f"{objective} (+{others})"
+    return objective
+
+  def nameOf(self, planet):
+    """
+    Returns the name the planet has now, looked up by its id in the loaded planets
+    """
+    planets = self.game.gameScreen.planets
+    row = planets.rowOf(planet.id)
+    return planet.name if row is None else planets.names[row]
 
   def getActiveQuestPos(self):
     """
@@ -32,65 +109,201 @@ class QuestManager:
       return None
     return self.currentQuest.destination.pos
 
-  def generateQuests(self):
-    for i in range(len(self.game.gameScreen.planets)):
-      quest = DeliveryQuest("Deliver", self.game.gameScreen.planets[i], self.game, 10, random.choice(self.game.gameScreen.planets), i)
-      self.questList.append(quest)
-    print("[QuestManager] Generated ", len(self.questList), " quests")
+  #==========
+  #= Offers =
+  #==========
+  @property
+  def epoch(self):
+    """
+    Number of QUEST_REFRESH_TIME periods played, the offers change with it
+    """
+    return int(self.game.playtime // QUEST_REFRESH_TIME)
+
+  def generateQuest(self, planet, epoch):
+    """
+    Returns the quest planet offers during epoch, None if it has none
+    Only depends on the seed of the world, the id of the planet and epoch
+    """
+    gameScreen = self.game.gameScreen
+    planets = gameScreen.planets
+    universe = gameScreen.universe
+    rng = random.Random(f"{gameScreen.seed}:{planet.id}:{epoch}")
+    if universe is None:
+      ids = planets.ids[gameScreen.planetIndex.queryRadius(planet.pos, DELIVERY_RANGE)]
+    else:
+      ids, _ = universe.planetsAround(planet.pos, DELIVERY_RANGE)
+    # Sorted by id, the order of the rows depends on what was loaded first
+    candidates = np.sort(ids[ids != planet.id]).tolist()
+    if not candidates:
+      return None
+    destinationId = rng.choice(candidates)
+    if universe is not None:
+      # The destination may be in a chunk that is not loaded yet
+      universe.loadSystem(chunkOfId(destinationId))
+    destination = planets.findById(destinationId)
+    quest = DeliveryQuest("Deliver", planet, self.game, DELIVERY_REWARD, destination, None)
+    quest.epoch = epoch
+    return quest
+
+  def offerOf(self, planet):
+    """
+    Returns the quest planet offers now, None if it has none
+    The accepted quest of the epoch stays offered until it is completed
+    """
+    epoch = self.epoch
+    accepted = self.byGiver.get(planet.id)
+    if accepted is not None and accepted.epoch == epoch:
+      return None if accepted.completed else accepted
+    if self.offersEpoch != epoch:
+      self.offers = {}
+      self.offersEpoch = epoch
+    if planet.id not in self.offers:
+      self.offers[planet.id] = self.generateQuest(planet, epoch)
+    return self.offers[planet.id]
+
+  def dropQuests(self, planets):
+    """
+    Forgets the offers of planets that are unloaded,
+    they are generated again (the same) if the planets come back
+    """
+    for planet in planets:
+      self.offers.pop(planet.id, None)
 
   def checkPlanetIsGiver(self, planet) -> bool:
     """
     Returns a bool,
     Checls if the planet is a quest giver
     """
-    for i in range(len(self.questList)):
-      if planet.name == self.questList[i].giver.name:
-        if self.questList[i].completed:
-          return False
-        return True
-      else:
-        pass
-    return False
+    return self.offerOf(planet) is not None
+
+  def isGiver(self, planet) -> bool:
+    """
+    Returns a bool,
+    Checks if the planet offers a quest without generating it (for the radar)
+    Every planet does, unless its quest of the epoch is completed
+    or its offer is already known to be empty (no planet in range)
+    """
+    epoch = self.epoch
+    accepted = self.byGiver.get(planet.id)
+    if accepted is not None and accepted.epoch == epoch:
+      return not accepted.completed
+    if self.offersEpoch == epoch and planet.id in self.offers:
+      return self.offers[planet.id] is not None
+    return True
+
+  def targetIds(self):
+    """
+    Returns the ids of the destinations of the active quests
+    """
+    return [id for id, quests in self.byDestination.items() if any(not quest.completed for quest in quests.values())]
 
   def checkPlanetIsTarget(self, planet) -> bool:
     """
     Returns a bool,
-    Check if a planet is the target of the current quest
+    Check if a planet is the target of an active quest
     """
-    if self.currentQuest is None:
-      return False
-    return planet.name == self.currentQuest.destination.name
+    return any(not quest.completed for quest in self.questsTo(planet))
+
+  #=========
+  #= Route =
+  #=========
+  def shipPos(self):
+    return self.game.gameScreen.ship.pos
+
+  def updateRoute(self):
+    """
+    Goes on improving the route while it can be, within its time budget
+    Called every update, does nothing once the route is settled
+    """
+    if not self.route.settled:
+      self.route.improve(self.shipPos())
+      self.trackNextStop()
+
+  def trackNextStop(self):
+    """
+    Tracks the quest of the first stop of the route
+    """
+    stop = self.route.nextStop()
+    self.currentQuest = None if stop is None else self.getQuest(stop[0])
+
+  def planRoute(self):
+    """
+    Builds the route of the active quests from scratch (after a load)
+    """
+    self.route.clear()
+    for quest in self.activeQuests():
+      # The cargo is loaded when the quest is accepted at its giver
+      self.route.addQuest(quest.id, quest.source.pos, quest.destination.pos, pickedUp=True, improve=False)
+    self.route.plan(self.shipPos())
+    self.trackNextStop()
 
 
   def acceptQuest(self, planet):
     # Need to verfy is quest is avaliable
-    # Planet is used to get questID (source is unique)
-    for i in range(len(self.questList)):
-      if planet.name == self.questList[i].giver.name:
-        id = i
-      else:
-        pass
-    if self.questList[id].completed != True:
-      self.currentQuest = self.questList[id]
+    # Planet is used to get the quest (source is unique)
+    quest = self.offerOf(planet)
+    if quest is not None:
+      # Kept (and saved) from now on
+      if quest.id is None:
+        quest.id = self.nextId
+        self.nextId += 1
+        self.offers.pop(planet.id, None)
+        self.addQuest(quest)
+      # Picked up right away, the ship is at the giver
+      if quest.id not in self.route:
+        self.route.start = tuple(self.shipPos())
+        self.route.addQuest(quest.id, quest.source.pos, quest.destination.pos, pickedUp=True)
+      self.trackNextStop()
       planet.buttons[0].setDisabled(True)
+      # Both ends of the quest must survive the universe streaming
+      universe = self.game.gameScreen.universe
+      chunks = []
+      if universe is not None:
+        universe.markModified(quest.source)
+        universe.markModified(quest.destination)
+        chunks = [list(universe.chunkOf(p.pos)) for p in (quest.source, quest.destination)]
+      self.game.journal.record("accept", quest=quest.toDict(), chunks=chunks)
     else:
       planet.buttons[0].setDisabled(True)
-      # Quest is unavailable (completed)
+      # Quest is unavailable (completed or none)
 
 
   def completeQuest(self, planet):
-   if planet.name == self.currentQuest.destination.name:
-      if not self.currentQuest.completed:
-        self.currentQuest.completed = True
-        self.game.phtonos.add(self.game, self.currentQuest.reward)
-        planet.buttons[1].setDisabled(True)
-        self.currentQuest = None
-      else:
-        planet.buttons[1].setDisabled(True)
+    """
+    Delivers every active quest whose destination is planet
+    """
+    completed = []
+    for quest in self.questsTo(planet):
+      if not quest.completed:
+        quest.completed = True
+        completed.append(quest)
+        self.game.phtonos.add(self.game, quest.reward)
+        self.route.start = tuple(self.shipPos())
+        self.route.removeQuest(quest.id)
+    if completed:
+      chunks = self.keepQuestChunks()
+      for quest in completed:
+        self.game.journal.record("complete", id=quest.id, chunks=chunks)
+    planet.buttons[1].setDisabled(True)
+    self.trackNextStop()
+
+  def keepQuestChunks(self):
+    """
+    Keeps in the streamed universe only the chunks of the ends of the active quests,
+    so those of the completed ones can be evicted (and are no longer saved)
+    Returns the keys of the kept chunks, [] without a streamed universe
+    """
+    universe = self.game.gameScreen.universe
+    if universe is None:
+      return []
+    universe.keepModified(
+      universe.chunkOf(planet.pos) for quest in self.activeQuests() for planet in (quest.source, quest.destination)
+    )
+    return [list(key) for key in universe.modifiedKeys()]
 
   def toDict(self):
     return {
-        "questList": [q.toDict() for q in self.questList],
+        "questList": [q.toDict() for q in self.quests.values()],
         "currentQuestId": self.currentQuest.id if self.currentQuest else None,
     }
 
@@ -98,17 +311,20 @@ class QuestManager:
     from gameplay.quests.delivery import DeliveryQuest
 
     planets = self.game.gameScreen.planets
-    self.questList = []
+    self.quests = {}
+    self.byGiver = {}
+    self.byDestination = {}
+    self.offers = {}
+    self.offersEpoch = None
 
+    # Planets are found by id (saves of older versions: by name, with the index built once)
     for q_data in data["questList"]:
         if q_data.get("type") == "delivery":
             quest = DeliveryQuest.fromDict(q_data, planets)
-            self.questList.append(quest)
+            # The planets of that quest are in a chunk that was not saved
+            if quest is None:
+                continue
+            self.addQuest(quest)
+    self.nextId = max(self.quests, default=-1) + 1
 
-    current_id = data.get("currentQuestId")
-    if current_id is not None:
-        self.currentQuest = next(
-            (q for q in self.questList if q.id == current_id), None
-        )
-    else:
-        self.currentQuest = None
+    self.planRoute()
@@ -23,19 +23,27 @@ class DeliveryQuest(Quest):
 
     self.source      = giver # The giver is the source
     self.destination = destination
-    self.objective += " to " + str(destination.name)
+
+  def describe(self, nameOf):
+    return super().describe(nameOf) + " to " + str(nameOf(self.destination))
 
   def toDict(self):
       d = super().toDict()
       d["type"] = "delivery"
-      d["destination"] = self.destination.name
+      d["destinationId"] = self.destination.id
       return d
 
   @classmethod
   def fromDict(cls, data, planets):
-      planet_map = {p.name: p for p in planets}
-      giver = planet_map[data["giver"]]
-      destination = planet_map[data["destination"]]
+      if "giverId" in data:
+          giver = planets.findById(data["giverId"])
+          destination = planets.findById(data["destinationId"])
+      else:
+          # Saves of the versions that referred to planets by name
+          giver = planets.findByName(data["giver"], data.get("giverRow"))
+          destination = planets.findByName(data["destination"], data.get("destinationRow"))
+      if giver is None or destination is None:
+          return None
       quest = cls(
           objective="Deliver",
           giver=giver,
@@ -45,4 +53,5 @@ class DeliveryQuest(Quest):
           id=data["id"]
       )
       quest.completed = data["completed"]
+      quest.epoch = data.get("epoch", 0)
       return quest
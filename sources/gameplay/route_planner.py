@@ -0,0 +1,321 @@
+"""
+Route planner
+Orders the stops of the active delivery quests (pick up at the source, drop off at
+the destination) so the ship flies as little as possible, from its position.
+A pickup always comes before the dropoff of the same quest (precedence).
+
+The route is built by nearest neighbour, then improved with 2-opt (reverse a piece
+of the route) and Or-opt (move 1 to 3 consecutive stops elsewhere) until nothing
+gains or the time budget is spent. Quests added or removed later are inserted
+where they cost the least and the route is improved again within the budget,
+so it never has to be built from scratch while playing
+"""
+
+import time
+
+import numpy as np
+
+PICKUP = 0
+DROPOFF = 1
+
+# Seconds a change of the route may take, a part of a 60 FPS frame
+ROUTE_BUDGET = 0.004
+
+# Gains smaller than that are rounding errors
+EPSILON = 1e-6
+
+
+class RoutePlanner:
+    def __init__(self, start=(0, 0), budget=ROUTE_BUDGET):
+        """
+        start: where the route starts (the ship)
+        budget: seconds an improvement may take
+        """
+        self.start = (float(start[0]), float(start[1]))
+        self.budget = budget
+        # Stops in the order they should be visited, as (quest id, PICKUP or DROPOFF)
+        self.route = []
+        # Stop -> (x, y)
+        self.positions = {}
+        # False while improve() has moves left to try, it goes on at the next call
+        self.settled = True
+
+    def __len__(self):
+        return len(self.route)
+
+    def __contains__(self, questId):
+        return (questId, DROPOFF) in self.positions
+
+    #===========
+    #= Changes =
+    #===========
+    def addQuest(self, questId, source, destination, pickedUp=False, improve=True):
+        """
+        Inserts the stops of a quest where they make the route the shortest, then improves it
+        source, destination: positions of the stops
+        pickedUp: the cargo is already on board, only the dropoff is left
+        improve: False to add many quests before a plan()
+        """
+        dropoff = (questId, DROPOFF)
+        self.positions[dropoff] = (float(destination[0]), float(destination[1]))
+        if pickedUp:
+            self._insertOne(dropoff)
+        else:
+            pickup = (questId, PICKUP)
+            self.positions[pickup] = (float(source[0]), float(source[1]))
+            self._insertPair(pickup, dropoff)
+        self.settled = False
+        if improve:
+            self.improve()
+
+    def removeQuest(self, questId):
+        """
+        Removes the stops of a quest (completed or dropped), then improves the route
+        """
+        stops = {(questId, PICKUP), (questId, DROPOFF)}
+        if not stops & self.positions.keys():
+            return
+        self.route = [stop for stop in self.route if stop not in stops]
+        for stop in stops:
+            self.positions.pop(stop, None)
+        self.settled = False
+        self.improve()
+
+    def pickUp(self, questId):
+        """
+        The cargo of a quest is on board, its pickup stop is done
+        """
+        stop = (questId, PICKUP)
+        if stop in self.positions:
+            self.route.remove(stop)
+            del self.positions[stop]
+
+    def clear(self):
+        self.route = []
+        self.positions = {}
+        self.settled = True
+
+    #==========
+    #= Access =
+    #==========
+    def nextStop(self):
+        """
+        Returns the (quest id, PICKUP or DROPOFF) to visit first, None if there is none
+        """
+        return self.route[0] if self.route else None
+
+    def questOrder(self):
+        """
+        Returns the ids of the quests in the order their cargo is dropped off
+        """
+        return [questId for questId, kind in self.route if kind == DROPOFF]
+
+    def length(self, start=None):
+        """
+        Returns the distance flown along the route from start (self.start if None)
+        """
+        points = self._points(start)
+        return float(np.hypot(*np.diff(points, axis=0).T).sum())
+
+    #=============
+    #= Internals =
+    #=============
+    def _points(self, start=None):
+        """
+        Returns the start and the stops of the route as a (n + 1, 2) array
+        """
+        start = self.start if start is None else start
+        points = np.empty((len(self.route) + 1, 2), dtype=np.float64)
+        points[0] = start
+        if self.route:
+            points[1:] = [self.positions[stop] for stop in self.route]
+        return points
+
+    def _partners(self):
+        """
+        Returns, for every point of _points, the point of the other stop of its quest
+        (-1 for the start and for the quests already picked up)
+        """
+        index = {stop: i + 1 for i, stop in enumerate(self.route)}
+        partners = np.full(len(self.route) + 1, -1, dtype=np.int64)
+        for i, (questId, kind) in enumerate(self.route):
+            partners[i + 1] = index.get((questId, 1 - kind), -1)
+        return partners
+
+    def _insertCosts(self, points, position):
+        """
+        Returns the extra distance of putting position after every point (the last one included)
+        """
+        after = np.hypot(*(points - position).T)
+        costs = after.copy()
+        # Between two points: the edge between them is replaced by two
+        costs[:-1] += after[1:] - np.hypot(*np.diff(points, axis=0).T)
+        return costs
+
+    def _insertOne(self, stop):
+        points = self._points()
+        k = int(np.argmin(self._insertCosts(points, self.positions[stop])))
+        self.route.insert(k, stop)
+
+    def _insertPair(self, pickup, dropoff):
+        """
+        Inserts a pickup and its dropoff after it, at their cheapest positions
+        """
+        points = self._points()
+        source = np.array(self.positions[pickup])
+        destination = np.array(self.positions[dropoff])
+        pickupCosts = self._insertCosts(points, source)
+        dropoffCosts = self._insertCosts(points, destination)
+        # Both in the same gap: point k -> pickup -> dropoff -> point k + 1
+        direct = float(np.hypot(*(destination - source)))
+        together = np.hypot(*(points - source).T) + direct
+        together[:-1] += np.hypot(*(points[1:] - destination).T) - np.hypot(*np.diff(points, axis=0).T)
+        # In different gaps: the pickup after point a, the dropoff after point b > a
+        bestPickup = np.minimum.accumulate(pickupCosts)
+        apart = np.full(len(points), np.inf)
+        apart[1:] = bestPickup[:-1] + dropoffCosts[1:]
+        if together.min() <= apart.min():
+            k = int(np.argmin(together))
+            self.route[k:k] = [pickup, dropoff]
+        else:
+            b = int(np.argmin(apart))
+            a = int(np.argmin(pickupCosts[:b]))
+            self.route.insert(b, dropoff)
+            self.route.insert(a, pickup)
+
+    #===============
+    #= Improvement =
+    #===============
+    def plan(self, start=None):
+        """
+        Builds the route again from scratch (nearest neighbour), then improves it
+        start: where the route starts, self.start if None
+        """
+        if start is not None:
+            self.start = (float(start[0]), float(start[1]))
+        stops = list(self.positions)
+        if not stops:
+            return
+        positions = np.array([self.positions[stop] for stop in stops])
+        # A dropoff can only be chosen once its pickup was
+        available = np.array([kind == PICKUP or (questId, PICKUP) not in self.positions for questId, kind in stops])
+        dropoffOf = {questId: i for i, (questId, kind) in enumerate(stops) if kind == DROPOFF}
+        visited = np.zeros(len(stops), dtype=bool)
+        current = np.array(self.start)
+        route = []
+        for _ in range(len(stops)):
+            distances = np.hypot(*(positions - current).T)
+            distances[~available | visited] = np.inf
+            i = int(np.argmin(distances))
+            visited[i] = True
+            route.append(stops[i])
+            questId, kind = stops[i]
+            if kind == PICKUP:
+                available[dropoffOf[questId]] = True
+            current = positions[i]
+        self.route = route
+        self.improve()
+
+    def improve(self, start=None, budget=None):
+        """
+        Applies 2-opt and Or-opt moves until none gains or the budget is spent
+        Returns True if the route could not be improved anymore
+        """
+        if start is not None:
+            self.start = (float(start[0]), float(start[1]))
+        deadline = time.perf_counter() + (self.budget if budget is None else budget)
+        while True:
+            improved = self._twoOpt(deadline)
+            for size in (1, 2, 3):
+                improved = self._orOpt(size, deadline) or improved
+            if time.perf_counter() > deadline:
+                self.settled = False
+                return False
+            if not improved:
+                self.settled = True
+                return True
+
+    def _twoOpt(self, deadline):
+        """
+        Reverses pieces of the route, a piece can't hold both stops of a quest
+        Returns True if the route changed
+        """
+        improved = False
+        # The arrays are computed again after every move
+        stale = True
+        i = 1
+        n = len(self.route)
+        while i < n:
+            if time.perf_counter() > deadline:
+                break
+            if stale:
+                points = self._points()
+                edges = np.hypot(*np.diff(points, axis=0).T)
+                # A piece starting at i must end before the dropoff of any pickup it holds
+                partners = self._partners()
+                later = np.where(partners > np.arange(n + 1), partners, n + 1)
+                limits = np.minimum.accumulate(later[::-1])[::-1] - 1
+                stale = False
+            last = limits[i]
+            if last > i:
+                j = np.arange(i + 1, last + 1)
+                before = edges[i - 1] + np.where(j < n, edges[np.minimum(j, n - 1)], 0)
+                ends = np.minimum(j + 1, n)
+                after = np.hypot(*(points[j] - points[i - 1]).T) + np.where(j < n, np.hypot(*(points[ends] - points[i]).T), 0)
+                gains = before - after
+                best = int(np.argmax(gains))
+                if gains[best] > EPSILON:
+                    j = int(j[best])
+                    self.route[i - 1 : j] = self.route[i - 1 : j][::-1]
+                    improved = stale = True
+                    continue
+            i += 1
+        return improved
+
+    def _orOpt(self, size, deadline):
+        """
+        Moves pieces of size stops elsewhere in the route, keeping pickups before dropoffs
+        Returns True if the route changed
+        """
+        improved = False
+        i = 1
+        points = self._points()
+        partners = self._partners()
+        n = len(points) - 1
+        while i + size - 1 <= n:
+            if time.perf_counter() > deadline:
+                break
+            end = i + size - 1
+            first, lastPoint = points[i], points[end]
+            # Distance saved by taking the piece out
+            removed = np.hypot(*(first - points[i - 1]))
+            if end < n:
+                removed += np.hypot(*(points[end + 1] - lastPoint)) - np.hypot(*(points[end + 1] - points[i - 1]))
+            # Distance added by putting it after point k
+            toFirst = np.hypot(*(points - first).T)
+            costs = toFirst.copy()
+            costs[:-1] += np.hypot(*(points[1:] - lastPoint).T) - np.hypot(*np.diff(points, axis=0).T)
+            # Its own place, and the places of the pieces' stops
+            costs[i - 1 : end + 1] = np.inf
+            # Pickups stay before their dropoffs, dropoffs after their pickups
+            piece = partners[i : end + 1]
+            outside = (piece >= 0) & ((piece < i) | (piece > end))
+            lowest = piece[outside & (piece < i)]
+            highest = piece[outside & (piece > end)]
+            if len(lowest):
+                costs[: lowest.max()] = np.inf
+            if len(highest):
+                costs[highest.min() :] = np.inf
+            k = int(np.argmin(costs))
+            if removed - costs[k] > EPSILON:
+                moved = self.route[i - 1 : end]
+                del self.route[i - 1 : end]
+                # Positions after the piece moved back by its size
+                k = k if k < i else k - size
+                self.route[k:k] = moved
+                points = self._points()
+                partners = self._partners()
+                improved = True
+                continue
+            i += 1
+        return improved
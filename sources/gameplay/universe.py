@@ -0,0 +1,212 @@
+"""
+Universe streaming
+The world is split in square chunks (Systems), each one generated
+from (seed, chunk x, chunk y) so it is always the same.
+Chunks are generated when the ship gets close and forgotten when it is far,
+only the modified ones are kept (and saved)
+"""
+
+import random
+
+import numpy as np
+
+from entities.planet_store import PlanetStore
+from gameplay.generation import MAX_RADIUS, RectDomain, generatePlanetField
+
+# Size of a chunk in world units
+CHUNK_SIZE = 8000
+
+# Planets per chunk, about the density of the old 1200 planets / 80000 spread universe
+PLANETS_PER_CHUNK = (2, 6)
+
+# Distance to the ship (in chunks) under which chunks are loaded,
+# and above which they are evicted (bigger, so we don't thrash on a border)
+LOAD_RADIUS = 2
+UNLOAD_RADIUS = 3
+
+MIN_DISTANCE = 300
+
+# Planet ids of a chunk are made of its position and the index of the planet in it,
+# so a planet gets the same id every time its chunk is generated
+CHUNK_ID_OFFSET = 2 ** 23
+
+
+def chunkFirstId(key):
+    """
+    Id of the first planet of a chunk, chunk coordinates on 24 bits, planet index on 8 bits
+    """
+    return ((key[0] + CHUNK_ID_OFFSET) << 32) | ((key[1] + CHUNK_ID_OFFSET) << 8)
+
+
+def chunkOfId(id):
+    """
+    Key of the chunk of a planet, from its id (see chunkFirstId)
+    """
+    return ((id >> 32) - CHUNK_ID_OFFSET, ((id >> 8) & 0xFFFFFF) - CHUNK_ID_OFFSET)
+
+
+class System:
+    """
+    A chunk of the universe and the rows of its planets in the PlanetStore
+    """
+
+    def __init__(self, key, center) -> None:
+        self.key = key
+        self.center = center
+        self.planets = []
+        # Modified systems are kept in memory and saved
+        self.modified = False
+
+
+class Universe:
+    def __init__(self, store, index, seed, onLoad=None, onUnload=None):
+        """
+        store: the PlanetStore the planets are added to
+        index: the SpatialHash over that store
+        seed: the seed of the universe
+        onLoad, onUnload: called with the System after it is loaded / before it is evicted
+        """
+        self.store = store
+        self.index = index
+        self.seed = seed
+        self.onLoad = onLoad
+        self.onUnload = onUnload
+        self.systems = {}
+        # Row of the store -> System owning it
+        self._owners = {}
+        self._center = None
+
+    def chunkOf(self, pos):
+        return (int(pos[0] // CHUNK_SIZE), int(pos[1] // CHUNK_SIZE))
+
+    def chunkSeed(self, key):
+        """
+        The seed of a chunk, only depends on the universe seed and the chunk position
+        """
+        return f"{self.seed}:{key[0]}:{key[1]}"
+
+    def systemOf(self, planet):
+        """
+        Returns the System a planet belongs to, loading it if needed
+        """
+        return self.loadSystem(self.chunkOf(planet.pos))
+
+    def loadSystem(self, key):
+        """
+        Generates the System of a chunk (if it is not already loaded) and returns it
+        """
+        system = self.systems.get(key)
+        if system is not None:
+            return system
+        cx, cy = key
+        system = System(key, ((cx + 0.5) * CHUNK_SIZE, (cy + 0.5) * CHUNK_SIZE))
+        first = len(self.store)
+        self.generateChunk(self.store, key)
+        system.planets = list(range(first, len(self.store)))
+        for row in system.planets:
+            self.index.insert(row)
+            self._owners[row] = system
+        self.systems[key] = system
+        if self.onLoad:
+            self.onLoad(system)
+        return system
+
+    def generateChunk(self, store, key):
+        """
+        Adds the planets of a chunk to a store, they only depend on the seed and the key
+        """
+        cx, cy = key
+        # Keep planets away from the borders so two chunks can't break the minimal distance
+        margin = MIN_DISTANCE / 2 + MAX_RADIUS
+        domain = RectDomain(
+            cx * CHUNK_SIZE + margin,
+            cy * CHUNK_SIZE + margin,
+            CHUNK_SIZE - 2 * margin,
+            CHUNK_SIZE - 2 * margin,
+        )
+        seed = self.chunkSeed(key)
+        count = random.Random(seed).randint(*PLANETS_PER_CHUNK)
+        generatePlanetField(store, count, domain, MIN_DISTANCE, seed=seed, firstId=chunkFirstId(key))
+
+    def planetsAround(self, pos, radius):
+        """
+        Returns the (ids, positions) of the planets whose center is within radius of pos, sorted by id
+        The chunks that are not loaded are generated aside (and not kept),
+        so the result doesn't depend on what is loaded
+        """
+        ids, positions = [], []
+        cx0, cy0 = self.chunkOf((pos[0] - radius, pos[1] - radius))
+        cx1, cy1 = self.chunkOf((pos[0] + radius, pos[1] + radius))
+        for x in range(cx0, cx1 + 1):
+            for y in range(cy0, cy1 + 1):
+                system = self.systems.get((x, y))
+                if system is not None:
+                    store, rows = self.store, system.planets
+                else:
+                    store = PlanetStore()
+                    self.generateChunk(store, (x, y))
+                    rows = list(range(len(store)))
+                ids.append(store.ids[rows])
+                positions.append(store.positions[rows])
+        ids = np.concatenate(ids)
+        positions = np.concatenate(positions)
+        near = np.hypot(*(positions - (pos[0], pos[1])).T) <= radius
+        order = np.argsort(ids[near])
+        return ids[near][order], positions[near][order]
+
+    def unloadSystem(self, system):
+        """
+        Forgets a System, its planet rows are freed
+        """
+        if self.onUnload:
+            self.onUnload(system)
+        for row in system.planets:
+            self.index.remove(row)
+            del self._owners[row]
+        for old, new in self.store.remove(system.planets):
+            self.index.move(old, new)
+            owner = self._owners.pop(old)
+            owner.planets[owner.planets.index(old)] = new
+            self._owners[new] = owner
+        del self.systems[system.key]
+
+    def markModified(self, planet):
+        """
+        Keeps the System of a planet in memory and in the saves
+        """
+        self.systemOf(planet).modified = True
+
+    def keepModified(self, keys):
+        """
+        Marks the Systems of keys as modified (loading them if needed) and only them,
+        the others are evicted again when they are far
+        """
+        keys = set(keys)
+        for key in keys:
+            self.loadSystem(key)
+        for key, system in self.systems.items():
+            system.modified = key in keys
+        # Evicted at the next update, even if the ship stays in the same chunk
+        self._center = None
+
+    def modifiedKeys(self):
+        return [key for key, system in self.systems.items() if system.modified]
+
+    def update(self, pos):
+        """
+        Streams the chunks around a world position, cheap when it stays in the same chunk
+        Returns True if chunks were loaded or evicted
+        """
+        center = self.chunkOf(pos)
+        if center == self._center:
+            return False
+        self._center = center
+        cx, cy = center
+        for x in range(cx - LOAD_RADIUS, cx + LOAD_RADIUS + 1):
+            for y in range(cy - LOAD_RADIUS, cy + LOAD_RADIUS + 1):
+                self.loadSystem((x, y))
+        for key, system in list(self.systems.items()):
+            far = max(abs(key[0] - cx), abs(key[1] - cy)) > UNLOAD_RADIUS
+            if far and not system.modified:
+                self.unloadSystem(system)
+        return True
@@ -0,0 +1,109 @@
+"""
+Headless mode
+Runs the game without window nor sound and steps the game screen as fast as possible,
+to test or profile the game on machines without a display
+Run from the sources folder with:
+    python headless.py [--ticks N] [--load] [--no-render]
+"""
+
+import argparse
+import math
+import time
+
+from entities.ship import ShipControls
+from main import Game
+
+
+class ScriptedController:
+    """
+    Flies the ship without a keyboard: full thrust, turning a bit now and then,
+    so the universe streams around it like when someone is playing
+    """
+
+    def __init__(self, turnEvery=120, turnFor=30):
+        """
+        turnEvery: number of ticks between two turns
+        turnFor: how many ticks a turn lasts
+        """
+        self.turnEvery = turnEvery
+        self.turnFor = turnFor
+        self.tick = 0
+
+    def getControls(self):
+        controls = ShipControls()
+        controls.thrust = True
+        controls.turnRight = self.tick % self.turnEvery < self.turnFor
+        self.tick += 1
+        return controls
+
+
+def startGame(load=False):
+    """
+    Creates a headless Game and starts a new game (or loads the save) on the game screen
+    """
+    game = Game(headless=True)
+    game.controller = ScriptedController()
+    game.initScreens()
+    if load and game.slot in game.saves:
+        game.startOptions.loadGame()
+    else:
+        game.startOptions.newGame()
+    return game
+
+
+def stepGame(game, ticks, render=True):
+    """
+    Runs "ticks" simulation steps of the current screen, drawing a frame after each one
+    Returns a dict of timings
+    render: draw the frames (through the compositor, like the game)
+    """
+    screen = game.currentScreen
+    dt = game.timestep.dt
+    updateTime = renderTime = 0.0
+    frameTimes = []
+    start = time.perf_counter()
+    for _ in range(ticks):
+        t0 = time.perf_counter()
+        screen.update(dt)
+        if screen is game.gameScreen:
+            game.questManager.updateRoute()
+        t1 = time.perf_counter()
+        if render:
+            screen.interpolate(1.0)
+            game.compositor.present(screen)
+        t2 = time.perf_counter()
+        updateTime += t1 - t0
+        renderTime += t2 - t1
+        frameTimes.append(t2 - t0)
+    elapsed = time.perf_counter() - start
+    frameTimes.sort()
+    return {
+        "ticks": ticks,
+        "seconds": elapsed,
+        "ticksPerSecond": ticks / elapsed if elapsed > 0 else math.inf,
+        "updateMs": updateTime / ticks * 1000,
+        "renderMs": renderTime / ticks * 1000,
+        "worstMs": frameTimes[-1] * 1000,
+        "p95Ms": frameTimes[int(0.95 * (ticks - 1))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the game without display and reports its speed")
+    parser.add_argument("--ticks", type=int, default=1000, help="number of simulation steps")
+    parser.add_argument("--load", action="store_true", help="load the save instead of starting a new game")
+    parser.add_argument("--no-render", dest="render", action="store_false", help="only run the simulation")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    game = startGame(args.load)
+    print(f"[Headless] Game ready in {time.perf_counter() - start:.2f} s")
+
+    stats = stepGame(game, args.ticks, args.render)
+    print(f"[Headless] {stats['ticks']} ticks in {stats['seconds']:.2f} s: {stats['ticksPerSecond']:.0f} ticks/s")
+    print(f"[Headless] update {stats['updateMs']:.3f} ms, render {stats['renderMs']:.3f} ms, p95 {stats['p95Ms']:.3f} ms, worst {stats['worstMs']:.3f} ms")
+    print(f"[Headless] ship at {game.gameScreen.ship.pos}, {len(game.gameScreen.planets)} planets loaded")
+
+
+if __name__ == "__main__":
+    main()
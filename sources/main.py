@@ -2,7 +2,9 @@
 #= Imports =
 #===========
 # Python
+import os
 import sys
+import time
 import pygame
 
 # Custom modules
@@ -18,25 +20,41 @@ from screens.title_screen import TitleScreen
 from screens.start_screen import StartOptions
 
 # Utils
-from utils.save_manager import loadSave, saveGame
+from utils.save_manager import BackgroundSaver, journalFile, listSaves, loadSave, metaOf, slotFile, snapshot, updateManifest
+from utils.save_journal import AUTOSAVE_INTERVAL, COMPACT_SIZE, Journal
 from utils.settings_manager import loadSettings, saveSettings
 from utils.phtonos import Phtonos
+from rendering.compositor import Compositor
+from utils.fixed_timestep import FixedTimestep
+from utils.frame_profiler import FrameProfiler
+from ui.profiler_overlay import ProfilerOverlay
+from ui.save_indicator import SaveIndicator
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False):
         """
         This is the "spine" of the game, it centralise all values required for other compoments
+        headless: run without window nor sound (SDL dummy drivers), see headless.py
         """
+        self.headless = headless
+        if headless:
+            # Must be set before pygame is initialised
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+
         print("SpaceGame Copyright (C) 2026 Alexandre Delcamp--Enache, Pablo Perez\nThis program comes with ABSOLUTLY NO WARRANTY !\nThis is a free software, and you are welcome to redistribute it under certain condtions.\nSee the GNU/GPL License for more details")
 
         # Init Pygame
         pygame.mixer.pre_init(44100, -16, 2, 512)
         pygame.init()
         self.clock = pygame.time.Clock()
+        self.compositor = Compositor()
 
         # Load Settings
         self.settings = loadSettings()
+        # The simulation runs at a fixed rate, whatever the FPS
+        self.timestep = FixedTimestep(self.settings["tickRate"])
 
         # Init the screen and sets some parameters
         self.screen = pygame.display.set_mode(self.settings["resolution"])
@@ -45,9 +63,21 @@ class Game:
         pygame.display.set_caption("SpaceGame")
 
         # Load assets
-        self.images = loadImages()
+        self.images = loadImages(convert=not headless)
         self.fonts = loadFonts()
 
+        # Frame profiler, toggled with F3
+        self.profiler = FrameProfiler()
+        self.profilerOverlay = ProfilerOverlay(self.fonts["small"])
+
+        # Changes since the last save are journaled, the full saves are written
+        # on a worker thread and their state is shown on screen
+        self.journal = Journal()
+        self.saver = BackgroundSaver(slotFile(1))
+        self.lastAutosave = 0.0
+        self.lastShipRecord = None
+        self.saveIndicator = SaveIndicator(self.fonts["small"])
+
         # Create available ships
         self.availableShips = [
             Ship(
@@ -86,14 +116,19 @@ class Game:
 
         # Create the controller for the player to use
         self.controller = KeyboardController()
-        # Loads the save
-        self.save = loadSave(self)
-        # Load the saved money (uses save data)
+        # Lists the saves, only their metadata is read, the last played slot is selected
+        # Headless games only read them, see getSaves
+        self.save = None
+        self.saves = listSaves(migrate=not headless)
+        self.slot = max(self.saves, key=lambda slot: self.saves[slot]["timestamp"] or 0, default=1)
+        # Seconds played in the current game
+        self.playtime = 0.0
+        # Load the saved money (uses the metadata)
         self.amount = 0
-        if self.save != None:
-          self.amount = self.save["money"]
+        self.initPhtonos()
+        if self.slot in self.saves:
+          self.amount = self.saves[self.slot]["money"]
         else:
-          self.initPhtonos()
           self.phtonos.add(self, 100)
 
 
@@ -122,7 +157,64 @@ class Game:
         self.currentScreen = self.titleScreen
 
     def saveGame(self):
-        saveGame(self)
+        """
+        Takes a snapshot of the game and writes it in the background, returns right away
+        The journal starts a new generation, compacted once the save is written
+        """
+        data = snapshot(self, copy=True)
+        data["journal"] = self.journal.rotate()
+        # The slot may change before the save thread is done with it
+        slot = self.slot
+        self.saver.save(data, slotFile(slot), lambda data: self.onSaved(slot, data))
+
+    def closeGame(self):
+        """
+        Saves the game being played and stops journaling it
+        """
+        self.saveGame()
+        self.journal.close()
+
+    def onSaved(self, slot, data):
+        """
+        Called by the save thread once the save of slot is written
+        """
+        self.journal.compact(data["journal"])
+        updateManifest(slot, metaOf(data))
+
+    def startJournal(self, data=None):
+        """
+        Journals the game that was just started in the current slot, headless games never touch the saves
+        data: the save it was loaded from, None for a new game (which gets its first save)
+        """
+        if self.headless:
+            return
+        # The previous game may still be saving
+        self.saver.wait()
+        self.saver.path = slotFile(self.slot)
+        self.lastShipRecord = None
+        self.lastAutosave = time.monotonic()
+        if data is None:
+            self.journal.open(journalFile(self.slot))
+            self.saveGame()
+        else:
+            self.journal.open(journalFile(self.slot), data.get("journal", 0))
+
+    def autosave(self):
+        """
+        Records the ship every AUTOSAVE_INTERVAL seconds while playing,
+        writes a full save when the journal got too big
+        """
+        now = time.monotonic()
+        if self.journal.generation is None or now - self.lastAutosave < AUTOSAVE_INTERVAL:
+            return
+        self.lastAutosave = now
+        ship = self.gameScreen.ship
+        state = ([ship.pos.x, ship.pos.y], [ship.vel.x, ship.vel.y], ship.angle, self.gameScreen.zoom)
+        if state != self.lastShipRecord:
+            self.lastShipRecord = state
+            self.journal.record("ship", pos=state[0], vel=state[1], angle=state[2], zoom=state[3], playtime=self.playtime)
+        if self.journal.size > COMPACT_SIZE and not self.saver.busy:
+            self.saveGame()
 
     def initScreens(self):
       """
@@ -172,16 +264,33 @@ class Game:
       )
 
     def initPhtonos(self):
-      self.phtonos = Phtonos()
+      self.phtonos = Phtonos(self.journal, self)
 
     def initQuestManager(self):
       self.questManager = QuestManager(self)
 
     def getSaveData(self):
+        """
+        Loads the whole save of the current slot
+        """
+        # The save being written would be newer than the one on the disk
+        self.saver.wait()
         self.save = loadSave(self)
         return self.save
 
+    def getSaves(self):
+        """
+        Returns {slot: metadata} of the saves, without loading them
+        Headless games don't migrate the old saves nor write the manifest, they never touch the saves
+        """
+        self.saver.wait()
+        self.saves = listSaves(migrate=not self.headless)
+        return self.saves
+
     def quit(self):
+        # A save still being written would be lost
+        self.saver.wait()
+        self.journal.close()
         sys.exit()
 
     # ==================== GETTERS ====================
@@ -214,12 +323,29 @@ class Game:
         else:
             return "Please set a correct ship"
 
+    def exportProfile(self):
+        """
+        Writes the frames recorded by the profiler to profile-<date>.csv and .jsonl
+        """
+        name = time.strftime("profile-%Y%m%d-%H%M%S")
+        self.profiler.export(name + ".csv")
+        self.profiler.export(name + ".jsonl")
+
     def run(self):
         self.initScreens()
         self.currentScreen = self.titleScreen
+        profiler = self.profiler
         while True:
-            dt = self.clock.tick(self.settings["fps"]) / 1000.0
-            for event in pygame.event.get():
+            frameTime = self.clock.tick(self.settings["fps"]) / 1000.0
+            # Checked once per frame, so a disabled profiler costs nothing
+            profiling = profiler.enabled
+            if profiling:
+                profiler.begin(frameTime)
+
+            events = pygame.event.get()
+            if profiling:
+                profiler.mark("events")
+            for event in events:
                 if event.type == pygame.QUIT:
                     self.quit()
                 if event.type == pygame.KEYDOWN:
@@ -229,11 +355,36 @@ class Game:
                     ):
                         # Toggle pause
                         self.currentScreen = self.pauseScreen
+                    elif event.key == pygame.K_F3:
+                        profiler.toggle()
+                    elif event.key == pygame.K_F4 and profiler.count:
+                        self.exportProfile()
                 self.currentScreen.handleEvent(event)
-
-            self.currentScreen.update(dt)
-            self.currentScreen.render(self.screen)
-            pygame.display.flip()
+            if profiling:
+                profiler.mark("handleEvent")
+
+            for _ in range(self.timestep.advance(frameTime)):
+                self.currentScreen.update(self.timestep.dt)
+            if self.currentScreen is self.gameScreen:
+                self.playtime += frameTime
+                self.autosave()
+                # Once per frame, not per step: catching up must not plan the route 15 times
+                self.questManager.updateRoute()
+            self.currentScreen.interpolate(self.timestep.alpha)
+            if profiling:
+                profiler.mark("update")
+
+            # Only the parts of the screen that changed are sent to the display
+            self.compositor.drawScreen(self.currentScreen)
+            self.profilerOverlay.draw(self.compositor, profiler)
+            self.saveIndicator.draw(self.compositor, self.saver)
+            rects = self.compositor.compose(pygame.display.get_surface())
+            if profiling:
+                profiler.mark("render")
+            self.compositor.flip(rects)
+            if profiling:
+                profiler.mark("flip")
+                profiler.end()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+"""
+Camera
+Holds the viewport of the game screen (where it looks and how close),
+and does the world <-> screen conversions for everything drawn in the world
+"""
+
+import numpy as np
+import pygame
+
+
+class Camera:
+    def __init__(self, width, height, zoom=1.0):
+        """
+        width, height: size of the viewport in pixels
+        zoom: pixels per world unit
+        """
+        self.width = width
+        self.height = height
+        self.zoom = zoom
+        self.offset = pygame.Vector2(0, 0)
+        # Bumped every time the transform changes,
+        # objects use it to know if their cached screen position is still valid
+        self.version = 0
+        # Debug stats of the last cull
+        self.visibleCount = 0
+        self.totalCount = 0
+        self._cullKey = None
+        self._culled = None
+
+    def follow(self, center, zoom, size=None):
+        """
+        Centers the camera on a world position
+        center: world position to look at
+        zoom: zoom to use
+        size: new viewport size, if the surface changed
+        """
+        if size is not None:
+            self.width, self.height = size
+        offset = (
+            center[0] - self.width / 2 / zoom,
+            center[1] - self.height / 2 / zoom,
+        )
+        if offset != tuple(self.offset) or zoom != self.zoom:
+            self.offset.update(offset)
+            self.zoom = zoom
+            self.version += 1
+
+    def worldRect(self):
+        """
+        Returns the (left, top, width, height) of the visible world area
+        """
+        return (
+            self.offset.x,
+            self.offset.y,
+            self.width / self.zoom,
+            self.height / self.zoom,
+        )
+
+    def toScreen(self, pos):
+        """
+        Converts a world position to integer screen coordinates
+        """
+        return (
+            int((pos[0] - self.offset.x) * self.zoom),
+            int((pos[1] - self.offset.y) * self.zoom),
+        )
+
+    def toWorld(self, screenPos):
+        """
+        Converts a screen position to a world position
+        """
+        return pygame.Vector2(
+            screenPos[0] / self.zoom + self.offset.x,
+            screenPos[1] / self.zoom + self.offset.y,
+        )
+
+    def scale(self, length):
+        """
+        Converts a world length to pixels
+        """
+        return int(length * self.zoom)
+
+    def cull(self, index):
+        """
+        Returns the planets of a spatial index that are worth drawing,
+        as (rows, xs, ys, radii) arrays already projected to the screen
+        Everything outside the viewport, or too small to cover a pixel, is rejected
+        The result is cached until the camera moves or the index changes
+        index: a SpatialHash
+        """
+        key = (self.version, id(index), index.revision)
+        if key == self._cullKey:
+            return self._culled
+        self.totalCount = len(index)
+        # Nothing can be bigger than a pixel, skip the whole set
+        if self.scale(index.maxRadius) <= 1:
+            rows = np.empty(0, dtype=np.int64)
+        else:
+            rows = index.queryRect(*self.worldRect())
+        xs, ys, radii = index.store.project(rows, self.offset, self.zoom)
+        big = radii > 1
+        self._culled = (rows[big], xs[big], ys[big], radii[big])
+        self._cullKey = key
+        self.visibleCount = len(self._culled[0])
+        return self._culled
@@ -0,0 +1,206 @@
+"""
+Compositor
+The frame is built from cached layers (background, world, hud, overlay).
+Screens only redraw the layers, or the parts of a layer, that changed,
+and only the changed rectangles are sent to the display
+"""
+
+import pygame
+
+# Layers from the bottom to the top
+LAYERS = ("background", "world", "hud", "overlay")
+
+# Opaque layers cover the whole screen, the others only hold a few regions
+OPAQUE_LAYERS = ("background", "world")
+
+# Above this part of the screen being dirty, update the whole screen at once
+FULL_UPDATE_RATIO = 0.6
+
+TRANSPARENT = (0, 0, 0, 0)
+
+
+class Layer:
+    def __init__(self, size, opaque):
+        """
+        size: size of the screen
+        opaque: an opaque layer covers the whole screen,
+                a transparent one is made of named regions
+        """
+        self.opaque = opaque
+        flags = 0 if opaque else pygame.SRCALPHA
+        self.surface = pygame.Surface(size, flags)
+        self.rect = self.surface.get_rect()
+        # Rectangles changed since the last composition
+        self.dirty = []
+        # Name -> Rect of the regions drawn in a transparent layer
+        self.regions = {}
+        self._contents = {}
+        # An opaque layer is only composed once something was drawn on it
+        self.active = False
+
+    def invalidate(self, rect=None):
+        """
+        Marks a part of the layer (all of it if None) as changed
+        """
+        self.active = True
+        self.dirty.append(self.rect if rect is None else pygame.Rect(rect))
+
+    def clear(self):
+        self.surface.fill(TRANSPARENT if not self.opaque else (0, 0, 0))
+        self.regions = {}
+        self._contents = {}
+        self.active = False
+        self.dirty = []
+
+    def beginRegion(self, name, rect):
+        """
+        Clears the old and new rectangles of a region and returns the surface,
+        clipped to the new rectangle, to draw the region with
+        """
+        rect = pygame.Rect(rect)
+        old = self.regions.get(name)
+        if old is not None:
+            self.surface.fill(TRANSPARENT, old)
+            self.dirty.append(old)
+        self.surface.fill(TRANSPARENT, rect)
+        self.dirty.append(rect)
+        self.regions[name] = rect
+        self.surface.set_clip(rect)
+        return self.surface
+
+    def endRegion(self):
+        self.surface.set_clip(None)
+
+    def removeRegion(self, name):
+        old = self.regions.pop(name, None)
+        self._contents.pop(name, None)
+        if old is not None:
+            self.surface.fill(TRANSPARENT, old)
+            self.dirty.append(old)
+
+    def put(self, name, images):
+        """
+        Draws a region made of images, only if they changed since the last call
+        images: list of (surface, position)
+        Text surfaces come from the text cache, so the same text is the same object
+        """
+        if not images:
+            self.removeRegion(name)
+            return
+        content = [(id(img), tuple(pos)) for img, pos in images]
+        if self._contents.get(name) == content:
+            return
+        self._contents[name] = content
+        rect = images[0][0].get_rect(topleft=images[0][1])
+        rect.unionall_ip([img.get_rect(topleft=pos) for img, pos in images[1:]])
+        surface = self.beginRegion(name, rect)
+        surface.fblits(images)
+        self.endRegion()
+
+
+class Compositor:
+    def __init__(self):
+        self.size = None
+        self.layers = {}
+        self._screen = None
+        self._keys = {}
+        # Debug stat: number of pixels sent to the display by the last frame
+        self.updatedArea = 0
+
+    def layer(self, name):
+        return self.layers[name]
+
+    def reset(self, size):
+        """
+        Empties the layers (recreated if the size changed), everything will be redrawn
+        """
+        if size != self.size:
+            self.size = size
+            self.layers = {name: Layer(size, name in OPAQUE_LAYERS) for name in LAYERS}
+        else:
+            for layer in self.layers.values():
+                layer.clear()
+        self._keys = {}
+        self.layers["background"].invalidate()
+
+    def changed(self, key, slot="screen"):
+        """
+        Returns True if key is different from the one given last time for that slot
+        Screens use it to know if what they would draw changed
+        """
+        if slot in self._keys and self._keys[slot] == key:
+            return False
+        self._keys[slot] = key
+        return True
+
+    def _dirtyRects(self):
+        rects = []
+        for layer in self.layers.values():
+            rects.extend(layer.dirty)
+            layer.dirty = []
+        if not rects:
+            return []
+        screenRect = pygame.Rect((0, 0), self.size)
+        # Merge the overlapping rectangles
+        merged = []
+        for rect in rects:
+            rect = rect.clip(screenRect)
+            if not rect:
+                continue
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect.union_ip(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        area = sum(r.w * r.h for r in merged)
+        if area >= FULL_UPDATE_RATIO * screenRect.w * screenRect.h:
+            return [screenRect]
+        return merged
+
+    def compose(self, target):
+        """
+        Blits the changed parts of the layers on the target surface
+        Returns the list of updated rectangles
+        """
+        rects = self._dirtyRects()
+        # Nothing under the topmost opaque layer in use can be seen
+        start = 0
+        for i, name in enumerate(LAYERS):
+            if self.layers[name].opaque and self.layers[name].active:
+                start = i
+        for rect in rects:
+            for name in LAYERS[start:]:
+                layer = self.layers[name]
+                if layer.opaque:
+                    target.blit(layer.surface, rect, rect)
+                    continue
+                for region in layer.regions.values():
+                    clip = rect.clip(region)
+                    if clip:
+                        target.blit(layer.surface, clip, clip)
+        self.updatedArea = sum(r.w * r.h for r in rects)
+        return rects
+
+    def drawScreen(self, screen):
+        """
+        Lets the screen update its layers, they are emptied first if the screen changed
+        """
+        size = pygame.display.get_surface().get_size()
+        if size != self.size or screen is not self._screen:
+            self.reset(size)
+            self._screen = screen
+        screen.draw(self)
+
+    def flip(self, rects):
+        """
+        Pushes the changed rectangles to the display
+        """
+        if rects:
+            pygame.display.update(rects)
+
+    def present(self, screen):
+        """
+        Lets the screen update its layers, then pushes the changed rectangles to the display
+        """
+        self.drawScreen(screen)
+        self.flip(self.compose(pygame.display.get_surface()))
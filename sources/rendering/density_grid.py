@@ -0,0 +1,148 @@
+"""
+Density grid
+At extreme zoom-out planets are smaller than a pixel and there can be millions
+of them in view. Instead of drawing them one by one, the planets are aggregated
+in a pyramid of grids (each level has cells twice as big as the previous one),
+and the level whose cells are about two pixels wide is drawn as a single image
+"""
+
+import math
+
+import numpy as np
+import pygame
+
+# Below this zoom the density grid is drawn instead of the planets
+LOD_ZOOM = 0.01
+
+# Size of the cells of the finest level, in world units
+BASE_CELL = 200
+
+# Smallest size of a cell on screen, in pixels
+MIN_CELL_PIXELS = 2
+
+
+class GridLevel:
+    """
+    The occupied cells of one level, sorted by row then column
+    """
+
+    def __init__(self, cellSize, cells, colors, counts):
+        """
+        cellSize: size of the cells in world units
+        cells: (N, 2) integer cell coordinates of the points to aggregate
+        colors: (N, 3) colors of the points
+        counts: number of planets behind each point
+        """
+        self.cellSize = cellSize
+        self.cx = self.cy = self.counts = np.empty(0, dtype=np.int64)
+        self.colors = np.empty((0, 3), dtype=np.float32)
+        if not len(cells):
+            return
+        # Sort by (cy, cx) so a band of rows is a contiguous slice,
+        # on a single packed key which is much faster than a lexsort
+        low = cells.min(axis=0)
+        keys = (cells[:, 1] - low[1]) * (int(cells[:, 0].max() - low[0]) + 1) + (cells[:, 0] - low[0])
+        order = np.argsort(keys)
+        keys = keys[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        cells = cells[order]
+        self.cx = cells[starts, 0]
+        self.cy = cells[starts, 1]
+        counts = counts[order]
+        self.counts = np.add.reduceat(counts, starts)
+        # Average color of the planets of each cell
+        sums = np.add.reduceat(colors[order].astype(np.float32) * counts[:, None], starts, axis=0)
+        self.colors = sums / self.counts[:, None]
+
+    @classmethod
+    def fromPositions(cls, cellSize, positions, colors):
+        cells = np.floor(positions / cellSize).astype(np.int64)
+        return cls(cellSize, cells, colors, np.ones(len(cells), dtype=np.int64))
+
+    def coarser(self, steps):
+        """
+        Returns the level with cells 2**steps times bigger, built from this one
+        """
+        cells = np.stack((self.cx, self.cy), axis=1) >> steps
+        return GridLevel(self.cellSize * 2 ** steps, cells, self.colors, self.counts)
+
+    def __len__(self):
+        return len(self.cx)
+
+    def query(self, cx0, cy0, cx1, cy1):
+        """
+        Returns the indices of the cells in the [cx0, cx1] x [cy0, cy1] range
+        """
+        lo = np.searchsorted(self.cy, cy0, "left")
+        hi = np.searchsorted(self.cy, cy1, "right")
+        cx = self.cx[lo:hi]
+        return lo + np.flatnonzero((cx >= cx0) & (cx <= cx1))
+
+
+class DensityGrid:
+    def __init__(self, baseCell=BASE_CELL, minCellPixels=MIN_CELL_PIXELS):
+        """
+        baseCell: size of the cells of the finest level, in world units
+        minCellPixels: smallest size of a cell on screen
+        """
+        self.baseCell = baseCell
+        self.minCellPixels = minCellPixels
+        self._levels = {}
+        self._indexKey = None
+        # Debug stat: number of cells drawn by the last render
+        self.visibleCount = 0
+
+    def levelFor(self, zoom):
+        """
+        Returns the first level whose cells are at least minCellPixels wide at that zoom
+        """
+        return max(0, math.ceil(math.log2(self.minCellPixels / (self.baseCell * zoom))))
+
+    def level(self, index, n):
+        """
+        Returns the level n of the grid over the planets of a SpatialHash,
+        levels are built the first time they are needed, and rebuilt when the index changes
+        """
+        key = (id(index), index.revision)
+        if key != self._indexKey:
+            self._levels = {}
+            self._indexKey = key
+        level = self._levels.get(n)
+        if level is None:
+            finer = [i for i in self._levels if i < n]
+            if finer:
+                # Much cheaper than starting again from the planets
+                level = self._levels[max(finer)].coarser(n - max(finer))
+            else:
+                store = index.store
+                level = GridLevel.fromPositions(self.baseCell * 2 ** n, store.positions[: len(store)], store.colors[: len(store)])
+            self._levels[n] = level
+        return level
+
+    def render(self, surface, camera, index, background):
+        """
+        Draws the planets of the index as a density image
+        background: color of the empty space, the cells are blended with it
+        """
+        level = self.level(index, self.levelFor(camera.zoom))
+        cellSize = level.cellSize
+        left, top, width, height = camera.worldRect()
+        cx0, cy0 = math.floor(left / cellSize), math.floor(top / cellSize)
+        cx1, cy1 = math.floor((left + width) / cellSize), math.floor((top + height) / cellSize)
+        cells = level.query(cx0, cy0, cx1, cy1)
+        self.visibleCount = len(cells)
+        if not len(cells):
+            return
+
+        # One pixel per cell, scaled up to the screen afterwards
+        # More planets in a cell make it brighter
+        intensity = np.minimum(1.0, 0.4 + 0.2 * level.counts[cells])[:, None]
+        image = np.empty((cx1 - cx0 + 1, cy1 - cy0 + 1, 3), dtype=np.uint8)
+        image[:] = background
+        image[level.cx[cells] - cx0, level.cy[cells] - cy0] = level.colors[cells] * intensity + np.array(background) * (1 - intensity)
+
+        cellPixels = cellSize * camera.zoom
+        x = math.floor((cx0 * cellSize - camera.offset.x) * camera.zoom)
+        y = math.floor((cy0 * cellSize - camera.offset.y) * camera.zoom)
+        size = (round(image.shape[0] * cellPixels), round(image.shape[1] * cellPixels))
+        surface.blit(pygame.transform.scale(pygame.surfarray.make_surface(image), size), (x, y))
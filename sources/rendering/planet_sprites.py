@@ -0,0 +1,110 @@
+"""
+Planet sprites
+Planets are plain circles, so a (color, screen radius, halo) combination
+always gives the same pixels. Each combination is rasterized once in a small
+surface, and the visible planets are drawn with a single batched fblits call
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+# Above this screen radius planets are drawn directly, there are only a few of them
+# on screen and their sprites would be big
+MAX_SPRITE_RADIUS = 64
+
+# Maximum number of sprites kept (LRU)
+MAX_ENTRIES = 2048
+
+HALO_COLOR = (255, 255, 120)
+HALO_GAP = 10
+HALO_WIDTH = 3
+
+# Color used as the transparent color of the sprites
+COLORKEY = (255, 0, 255)
+
+
+def drawPlanet(surface, color, screenPos, screenRadius, inRange):
+    """
+    Draws a planet (and its halo if the ship is in range) at screen coordinates
+    """
+    if inRange:
+        pygame.draw.circle(surface, HALO_COLOR, screenPos, screenRadius + HALO_GAP, width=HALO_WIDTH)
+    pygame.draw.circle(surface, color, screenPos, screenRadius)
+
+
+class PlanetSpriteCache:
+    def __init__(self, maxRadius=MAX_SPRITE_RADIUS, maxEntries=MAX_ENTRIES):
+        """
+        maxRadius: biggest screen radius that gets a sprite
+        maxEntries: how many sprites to keep before evicting the least used
+        """
+        self.maxRadius = maxRadius
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _render(self, color, radius, halo):
+        extent = radius + HALO_GAP if halo else radius
+        sprite = pygame.Surface((2 * extent + 1, 2 * extent + 1))
+        sprite.fill(COLORKEY)
+        drawPlanet(sprite, color, (extent, extent), radius, halo)
+        sprite.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        return sprite, extent
+
+    def get(self, color, radius, halo=False):
+        """
+        Returns (sprite, extent), the sprite is centered on the planet,
+        so it goes at (x - extent, y - extent)
+        """
+        key = (color, radius, halo)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self._entries[key] = self._render(color, radius, halo)
+        if len(self._entries) > self.maxEntries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def draw(self, surface, colors, xs, ys, radii, halos=None):
+        """
+        Draws a set of planets
+        colors: (N, 3) uint8 array of RGB colors
+        xs, ys, radii: integer arrays of screen coordinates and radii
+        halos: boolean array, True for the planets drawn with a halo
+        """
+        if halos is None:
+            halos = np.zeros(len(radii), dtype=bool)
+        small = radii <= self.maxRadius
+        # One integer key per planet, so the sprites are looked up once per distinct key
+        keys = (
+            colors[small].astype(np.int64) @ np.array([1 << 32, 1 << 24, 1 << 16])
+            + radii[small].astype(np.int64) * 2
+            + halos[small]
+        )
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sprites = []
+        extents = np.empty(len(unique), dtype=np.int64)
+        for i, key in enumerate(unique.tolist()):
+            color = ((key >> 32) & 0xFF, (key >> 24) & 0xFF, (key >> 16) & 0xFF)
+            sprite, extents[i] = self.get(color, (key & 0xFFFF) >> 1, bool(key & 1))
+            sprites.append(sprite)
+        offsets = extents[inverse]
+        positions = zip((xs[small] - offsets).tolist(), (ys[small] - offsets).tolist())
+        surface.fblits(zip([sprites[i] for i in inverse.tolist()], positions))
+
+        # The few big ones are drawn directly, on top
+        for i in np.flatnonzero(~small).tolist():
+            color = tuple(colors[i].tolist())
+            drawPlanet(surface, color, (int(xs[i]), int(ys[i])), int(radii[i]), bool(halos[i]))
+
+    def clear(self):
+        self._entries.clear()
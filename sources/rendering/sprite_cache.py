@@ -0,0 +1,123 @@
+"""
+Sprite cache
+Keeps pre-rendered rotated and zoomed versions of a sprite,
+so drawing a ship is a dict lookup and a blit instead of a rotozoom every frame
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+import pygame
+
+# Default angle step in degrees, 2° is not visible while flying
+ANGLE_STEP = 2
+
+# Zoom buckets per power of two, 8 gives a ~9% step between two sizes
+ZOOM_STEPS = 8
+
+# Maximum number of surfaces kept per sprite (LRU)
+MAX_ENTRIES = 720
+
+
+class SpriteCache:
+    def __init__(self, sprite, name="sprite", angleStep=ANGLE_STEP, zoomSteps=ZOOM_STEPS, maxEntries=MAX_ENTRIES):
+        """
+        sprite: the pygame surface to rotate
+        name: used in the logs
+        angleStep: angle bucket size, in degrees
+        zoomSteps: number of zoom buckets per power of two
+        maxEntries: how many surfaces to keep before evicting the least used
+        """
+        self.sprite = sprite
+        self.name = name
+        self.angleStep = angleStep
+        self.zoomSteps = zoomSteps
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # The cache can be filled from a background thread
+        self._lock = threading.Lock()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bucket(self, angle, zoom):
+        """
+        Returns the (angle, zoom) key of the bucket the values fall in
+        """
+        angleKey = int(round(angle / self.angleStep)) % int(round(360 / self.angleStep))
+        zoomKey = int(round(math.log2(max(zoom, 1e-6)) * self.zoomSteps))
+        return angleKey, zoomKey
+
+    def _render(self, key):
+        angleKey, zoomKey = key
+        angle = angleKey * self.angleStep
+        zoom = 2 ** (zoomKey / self.zoomSteps)
+        return pygame.transform.rotozoom(self.sprite, -angle + 90, zoom)
+
+    def _store(self, key, img):
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = img
+            self._bytes += img.get_width() * img.get_height() * img.get_bytesize()
+            while len(self._entries) > self.maxEntries:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.get_width() * old.get_height() * old.get_bytesize()
+        return img
+
+    def get(self, angle, zoom):
+        """
+        Returns the sprite rotated by "angle" (ship heading in degrees) and zoomed
+        """
+        key = self.bucket(angle, zoom)
+        with self._lock:
+            img = self._entries.get(key)
+            if img is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return img
+            self.misses += 1
+        return self._store(key, self._render(key))
+
+    def prebake(self, zooms=(1.0,), background=True):
+        """
+        Renders every angle for the given zoom levels
+        background: do it in a thread, so selecting a ship doesn't freeze the menu
+        """
+        keys = []
+        for zoom in zooms:
+            for step in range(int(round(360 / self.angleStep))):
+                keys.append(self.bucket(step * self.angleStep, zoom))
+
+        def bake():
+            for key in keys:
+                # The main thread reorders and evicts entries meanwhile
+                with self._lock:
+                    done = key in self._entries
+                if not done:
+                    self._store(key, self._render(key))
+            print(f"[SpriteCache] {self.name}: {len(self)} sprites, {self.memoryUsage() / 1024:.0f} Ko")
+
+        if not background:
+            bake()
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=bake, daemon=True)
+        self._thread.start()
+
+    def memoryUsage(self):
+        """
+        Returns the number of bytes used by the cached surfaces
+        """
+        return self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,68 @@
+"""
+Text cache
+Rendering text with pygame is slow, and most of the text of the game
+(titles, labels, instructions) is the same every frame.
+The surfaces are kept in a shared LRU cache keyed by (font, text, color, antialias)
+"""
+
+from collections import OrderedDict
+
+# Maximum number of text surfaces kept
+MAX_ENTRIES = 512
+
+
+class TextCache:
+    def __init__(self, maxEntries=MAX_ENTRIES):
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def render(self, font, text, antialias, color):
+        """
+        Same as font.render(text, antialias, color), but cached
+        The returned surface is shared, it must not be modified
+        """
+        key = (font, text, tuple(color), bool(antialias))
+        surface = self._entries.get(key)
+        if surface is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self._entries[key] = font.render(text, antialias, color)
+        if len(self._entries) > self.maxEntries:
+            self._entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._entries.clear()
+
+
+class CachedFont:
+    """
+    A pygame Font whose render() goes through a TextCache,
+    everything else is forwarded to the font
+    """
+
+    def __init__(self, font, cache):
+        self.font = font
+        self.cache = cache
+
+    def render(self, text, antialias, color, background=None):
+        if background is not None:
+            return self.font.render(text, antialias, color, background)
+        return self.cache.render(self.font, text, antialias, color)
+
+    def renderUncached(self, text, antialias, color):
+        """
+        Same as render(), without the cache, for the text that changes every frame
+        (numbers), which would evict the text that is drawn again and again
+        """
+        return self.font.render(text, antialias, color)
+
+    def __getattr__(self, name):
+        return getattr(self.font, name)
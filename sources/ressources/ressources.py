@@ -3,6 +3,7 @@ import os
 import pygame
 
 from entities.ship import Ship
+from rendering.text_cache import CachedFont, TextCache
 
 # Directories containing all game assets
 ASSET_DIR = os.path.join(os.path.dirname(__file__), "assets")
@@ -16,6 +17,9 @@ FONTS = {
     "small": ("Consolas", 14),
 }
 
+# Text cache shared by every font of the game
+TEXT_CACHE = TextCache()
+
 # All sprites available in the game
 IMAGES = {
     "gladius": "gladius.png",
@@ -33,27 +37,39 @@ MUSIC = {
 def loadFonts():
     """
     Loads all fonts defined in "FONTS"
+    Their render() goes through the shared text cache
 
     Returns:
-        Dict {name: object pygame.font.Font}
+        Dict {name: object CachedFont}
     """
     fonts = {}
     for key, (name, size) in FONTS.items():
         try:
-            fonts[key] = pygame.font.SysFont(name, size)
+            font = pygame.font.SysFont(name, size)
         except Exception as e:
             print(f"[Resources] Erreur lors du chargement de la police '{key}': {e}")
             # Fallback sur une police par défaut
-            fonts[key] = pygame.font.Font(None, size)
+            font = pygame.font.Font(None, size)
+        fonts[key] = CachedFont(font, TEXT_CACHE)
 
     print(f"[Resources] {len(fonts)} polices chargées")
     return fonts
 
 
-def loadImages():
+def getTextCache():
+    """
+    Returns the TextCache shared by all the fonts (for its hit/miss counters)
+    """
+    return TEXT_CACHE
+
+
+def loadImages(convert=True):
     """
     Loads all sprites defined in "IMAGES"
 
+    Args:
+        convert: convert the images to the display format (needs a display)
+
     Returns:
         Dict {name: object pygame.Surface}
     """
@@ -62,7 +78,8 @@ def loadImages():
     for key, filename in IMAGES.items():
         path = os.path.join(ASSET_DIR, filename)
         try:
-            images[key] = pygame.image.load(path).convert_alpha()
+            image = pygame.image.load(path)
+            images[key] = image.convert_alpha() if convert else image
             print(f"[Resources] Image chargée : {key} ({filename})")
             success += 1
         except Exception as e:
@@ -99,6 +116,21 @@ def getMusicPath(filename):
   """
   return os.path.join(MUSIC_DIR, filename)
 
+def playMusic(filename):
+  """
+  Plays a music in loop, does nothing if there is no sound or if the file is missing
+  Args:
+    filename: Name of the file in the music folder
+  """
+  if not pygame.mixer.get_init():
+    return
+  try:
+    pygame.mixer.music.stop()
+    pygame.mixer.music.load(getMusicPath(filename))
+    pygame.mixer.music.play(-1)
+  except (pygame.error, FileNotFoundError) as e:
+    print(f"[Resources] Impossible de lire la musique '{filename}': {e}")
+
 def getAssetPath(filename):
     """
     Returns the full path of an asset file
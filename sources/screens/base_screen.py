@@ -6,3 +6,29 @@ class Screen:
   def handle_event(self, event): pass
   def update(self, dt): pass
   def render(self, surface): pass
+
+  def interpolate(self, alpha):
+    """
+    Called before drawing with the part of a simulation step left over (0 to 1),
+    screens with moving things draw them between their previous and current state
+    """
+    pass
+
+  def renderKey(self):
+    """
+    Returns a value that changes whenever render() would draw something different,
+    None if the screen must be redrawn every frame
+    """
+    return None
+
+  def draw(self, compositor):
+    """
+    Draws the screen through the compositor,
+    static screens are only redrawn when their renderKey changes
+    """
+    key = self.renderKey()
+    if key is not None and not compositor.changed(key):
+      return
+    layer = compositor.layer("background")
+    self.render(layer.surface)
+    layer.invalidate()
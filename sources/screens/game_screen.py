@@ -6,17 +6,25 @@ import math
 import pygame
 import random
 
+import numpy as np
+
 # Custom
-from entities.planet import Planet, PLANET_TYPE
+from entities.planet_store import PlanetStore
 from entities.ship import Ship
 from screens.base_screen import Screen
+from gameplay.generation import AnnulusDomain, generatePlanetField
+from gameplay.universe import Universe
 from ui.button import Button
-from ressources.ressources import getMusicPath
+from ui.minimap import Minimap
+from ressources.ressources import playMusic
+from utils.kd_tree import KDTree
+from utils.spatial_hash import SpatialHash
+from rendering.camera import Camera
+from rendering.planet_sprites import PlanetSpriteCache
+from rendering.density_grid import LOD_ZOOM, DensityGrid
 
-class System: # Move elsewhere
-    def __init__(self, center) -> None:
-        self.center = center
-        self.planets = []
+# Colour of the radar arrow when it points at the nearest quest giver
+GIVER_RADAR_COLOR = (240, 200, 40)
 
 class GameScreen(Screen):
     def __init__(self, game, width, height, font, playerController):
@@ -24,11 +32,26 @@ class GameScreen(Screen):
         self.game = game
         self.ship = game.selectedShip
         self.zoom = 1.0
+        # Where to draw between the previous and the current simulation step
+        self.alpha = 1.0
+        self.camera = Camera(width, height)
         self.playerController = playerController
         self.font = font
+        self.minimap = Minimap(font)
+        self.planetSprites = PlanetSpriteCache()
+        self.densityGrid = DensityGrid()
         self.overlayOpen = False
         self.savedVel = pygame.Vector2(0,0) # To Stop
-        self.planets = []
+        self.seed = None
+        self.universe = None
+        self.planets = PlanetStore()
+        self.planetIndex = SpatialHash(self.planets)
+        # Rebuilt from the planets the first time it is used after they changed, see planetTree
+        self._planetTree = None
+        # What the quest radar points at this frame, see radarTarget
+        self.radar = None
+        self.inRangePlanets = []
+        self.overlayPlanet = None
 
         self.overlayRect = pygame.Rect(
             int(width * 0.05), # 5% From left
@@ -43,9 +66,7 @@ class GameScreen(Screen):
         ]
 
     def onEnter(self):
-      pygame.mixer.music.stop()
-      pygame.mixer.music.load(getMusicPath("main.wav"))
-      pygame.mixer.music.play(-1)
+      playMusic("main.wav")
 
     #================
     #= Save Loading =
@@ -56,89 +77,167 @@ class GameScreen(Screen):
         self.ship.pos = pygame.Vector2(pos)
         self.ship.vel = pygame.Vector2(vel)
         self.ship.angle = angle
-
-    def loadPlanets(self, planets):
+        self.ship.resetInterpolation()
+
+    def loadPlanets(self, planets, seed=None):
+        """
+        planets: a PlanetStore
+        seed: the seed of the world (quests depend on it),
+              a random one for the saves of the versions that didn't keep it
+        """
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.universe = None
         self.planets = planets
+        self.indexPlanets()
+
+    def indexPlanets(self):
+        """
+        (Re)builds the spatial index used by the range check, the draw and the minimap
+        """
+        self.planetIndex = SpatialHash.build(self.planets)
+        self.inRangePlanets = []
+        self.overlayPlanet = None
+        self.minimap.invalidate()
 
     #==================
     #= Procedural Gen =
     #==================
 
-    def generatePlanets(self, count=12, spread=8000, minDistance=300):
+    def generatePlanets(self, count=12, spread=8000, minDistance=300, seed=None):
         ''''
         Generates planets based on the parameters
         count: overhall planet count
         spread: how much space they occupy
         minDistantce: the minimal distance form eachother
+        seed: the seed of the universe, a random one is picked if None
         '''
         print("[GameScreen] Generating planets...")
-        planets = []
-
-        for _ in range(count):
-            planetType = random.choice(list(PLANET_TYPE.keys()))
-            typeData = PLANET_TYPE[planetType]
-
-            radius = random.randint(*typeData["radiusRange"])
-            color = random.choice(typeData["colors"])
-
-            placed = False
-            attempts = 0
-            currentMinDistance = minDistance
-
-            while not placed:
-                angle = random.uniform(0, 2 * math.pi)
-                dist = random.uniform(spread * 0.1, spread)
-                pos = pygame.Vector2(dist * math.cos(angle), dist * math.sin(angle))
-
-                tooClose = any( (pos - p.pos).length() < currentMinDistance + radius + p.radius for p in planets )
-
-                if not tooClose:
-                    self.planets.append(Planet(pos, radius, color, planetType=planetType))
-                    placed = True
-                else:
-                    attempts += 1
-                    if attempts % 20 == 0:
-                        currentMinDistance = max(50, currentMinDistance - 50)
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.planets = PlanetStore(count)
+        generatePlanetField(
+            self.planets,
+            count,
+            AnnulusDomain(spread * 0.1, spread),
+            minDistance,
+            seed=self.seed,
+        )
 
+        self.universe = None
+        self.indexPlanets()
         print(f"[Game] Generated {len(self.planets)} plannets")
 
+    def startUniverse(self, seed=None, chunks=()):
+        '''
+        Starts a streamed universe, chunks are generated around the ship as it moves
+        seed: the seed of the universe, a random one is picked if None
+        chunks: keys of the (modified) chunks to load right away, from a save
+        '''
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.planets = PlanetStore()
+        self.indexPlanets()
+        self.universe = Universe(
+            self.planets,
+            self.planetIndex,
+            self.seed,
+            onUnload=self.onSystemUnloaded,
+        )
+        for key in chunks:
+            self.universe.loadSystem(tuple(key)).modified = True
+        self.universe.update(self.ship.pos)
+        print(f"[GameScreen] Universe {self.seed} started, {len(self.universe.systems)} systems loaded")
+
+    @property
+    def planetTree(self):
+        """
+        KDTree over the planets, rebuilt when they changed (generated, loaded or streamed)
+        """
+        tree = self._planetTree
+        if tree is None or tree.store is not self.planets or tree.revision != self.planetIndex.revision:
+            self._planetTree = KDTree(self.planets, self.planetIndex.revision)
+        return self._planetTree
+
+    def nearestPlanets(self, k, pos=None):
+        """
+        Returns the k planets closest to pos (the ship if None), closest first
+        """
+        pos = self.ship.pos if pos is None else pos
+        return [self.planets[row] for row in self.planetTree.nearest(pos, k)]
+
+    def nearestGiver(self, pos=None):
+        """
+        Returns the closest planet with a quest to offer, None if there is none
+        """
+        pos = self.ship.pos if pos is None else pos
+        questManager = self.game.questManager
+        row = self.planetTree.nearestMatching(pos, lambda row: questManager.isGiver(self.planets[row]))
+        return None if row is None else self.planets[row]
+
+    def nearestTarget(self, pos=None):
+        """
+        Returns the closest planet that is the destination of an active quest, None if there is none
+        There are only a few of them, their rows are looked up by id instead of walking the tree
+        """
+        pos = self.ship.pos if pos is None else pos
+        rows = [self.planets.rowOf(id) for id in self.game.questManager.targetIds()]
+        rows = [row for row in rows if row is not None]
+        if not rows:
+            return None
+        return self.planets[rows[int(np.argmin(self.planets.distancesSq(pos, rows)))]]
+
+    def planetsWithin(self, radius, pos=None):
+        """
+        Returns the planets whose center is within radius of pos (the ship if None)
+        """
+        pos = self.ship.pos if pos is None else pos
+        return [self.planets[row] for row in self.planetTree.withinRadius(pos, radius).tolist()]
+
+    def onSystemUnloaded(self, system):
+        self.game.questManager.dropQuests([self.planets[row] for row in system.planets])
+
     def handleEvent(self, event):
       for btn in self.buttons:
         btn.handleEvent(event)
       if event.type == pygame.KEYDOWN:
           if event.key == pygame.K_e:
             # Overlay, to accept quest and complete them
-              for planet in self.planets:
-                  if getattr(planet, "inRange", False):
-                      for p in self.planets:
-                          p.showOverlay = False
-                          p.optionalText = ""
-                          p.buttons = []
-
-                      planet.showOverlay = True
-                      if self.game.questManager.checkPlanetIsGiver(planet):
-                        planet.optionalText += " \nI have a quest !"
-                        self.buttons[0].setCallback(lambda p=planet: self.game.questManager.acceptQuest(p))
-                        planet.buttons.append(self.buttons[0])
-                        planet.buttons[0].setDisabled(False)
-                      if self.game.questManager.checkPlanetIsTarget(planet):
-                        planet.optionalText += "            I am a target!"
-                        self.buttons[1].setCallback(lambda p=planet: self.game.questManager.completeQuest(p))
-                        planet.buttons.append(self.buttons[1])
-                        planet.buttons[1].setDisabled(False)
-                      # Stop the player
-                      self.savedVel = self.ship.vel.copy()
-                      self.ship.vel = pygame.Vector2(0,0)
-                      self.overlayOpen = True
+              for planet in self.inRangePlanets:
+                  self.closeOverlay()
+
+                  planet.showOverlay = True
+                  self.overlayPlanet = planet
+                  if self.game.questManager.checkPlanetIsGiver(planet):
+                    planet.optionalText += " \nI have a quest !"
+                    self.buttons[0].setCallback(lambda p=planet: self.game.questManager.acceptQuest(p))
+                    planet.buttons.append(self.buttons[0])
+                    planet.buttons[0].setDisabled(False)
+                  if self.game.questManager.checkPlanetIsTarget(planet):
+                    planet.optionalText += "            I am a target!"
+                    self.buttons[1].setCallback(lambda p=planet: self.game.questManager.completeQuest(p))
+                    planet.buttons.append(self.buttons[1])
+                    planet.buttons[1].setDisabled(False)
+                  # Stop the player
+                  self.savedVel = self.ship.vel.copy()
+                  self.ship.vel = pygame.Vector2(0,0)
+                  self.overlayOpen = True
           elif event.key == pygame.K_c:
-              for p in self.planets:
-                  p.showOverlay = False
-                  p.optionalText = ""
+              self.closeOverlay()
               self.ship.vel = self.savedVel
               self.overlayOpen = False
 
+    def closeOverlay(self):
+        """
+        Hides the overlay of the planet that has it open, if any
+        """
+        if self.overlayPlanet is None:
+            return
+        self.overlayPlanet.showOverlay = False
+        self.overlayPlanet.optionalText = ""
+        self.overlayPlanet.buttons = []
+        self.overlayPlanet = None
+
 
     def update(self, dt):
+        self.minimap.update(dt)
         keys = pygame.key.get_pressed()
         if keys[pygame.K_EQUALS] or keys[pygame.K_KP_PLUS]:
             self.zoom = min(2, self.zoom + 1.5 * dt)
@@ -146,13 +245,18 @@ class GameScreen(Screen):
             self.zoom = max(0.0001, self.zoom - 0.5 * dt)
 
         if self.overlayOpen:
+            self.ship.resetInterpolation()
             return
 
-        for planet in self.planets:
-            if planet.collidePoints(self.ship.pos, margin=10):
-                planet.inRange = True
-            else:
-                planet.inRange = False
+        if self.universe is not None:
+            self.universe.update(self.ship.pos)
+
+        # Only the planets near the ship can be in range
+        for planet in self.inRangePlanets:
+            planet.inRange = False
+        self.inRangePlanets = [self.planets[i] for i in self.planetIndex.queryRadius(self.ship.pos, 10)]
+        for planet in self.inRangePlanets:
+            planet.inRange = True
         controls = (
             self.playerController.getControls()
             if hasattr(self.playerController, "getControls")
@@ -163,125 +267,158 @@ class GameScreen(Screen):
     #=============
     #= Rendering =
     #=============
+    def interpolate(self, alpha):
+        self.alpha = alpha
+
     def render(self, surface):
+        """
+        Draws the whole frame on a surface
+        """
+        self.camera.follow(self.ship.interpolated(self.alpha)[0], self.zoom, surface.get_size())
+        self.radar = self.radarTarget()
+        self.renderWorld(surface)
+        surface.fblits(self.hudLines())
+        if self.overlayPlanet is not None:
+            self.overlayPlanet.renderOverlay(surface, self.font, self.overlayRect)
+
+    def draw(self, compositor):
+        """
+        Draws the frame through the compositor's layers,
+        each layer is only redrawn when what it shows changed
+        """
+        world = compositor.layer("world")
+        shipPos, shipAngle = self.ship.interpolated(self.alpha)
+        self.camera.follow(shipPos, self.zoom, world.surface.get_size())
+        # Once per frame, the world key and the radar use it
+        self.radar = self.radarTarget()
+        worldKey = (
+            self.camera.version,
+            self.planetIndex.revision,
+            shipAngle,
+            tuple(p.index for p in self.inRangePlanets),
+            self.radar,
+        )
+        if compositor.changed(worldKey, "world"):
+            self.renderWorld(world.surface)
+            world.invalidate()
+
+        compositor.layer("hud").put("text", self.hudLines())
+
+        overlay = compositor.layer("overlay")
+        planet = self.overlayPlanet
+        overlayKey = planet and (
+            planet,
+            planet.optionalText,
+            tuple(btn.renderKey() for btn in planet.buttons),
+        )
+        if compositor.changed(overlayKey, "overlay"):
+            if planet is None:
+                overlay.removeRegion("planet")
+            else:
+                rect = self.overlayRect.unionall([btn.getRect() for btn in planet.buttons])
+                planet.renderOverlay(overlay.beginRegion("planet", rect), self.font, self.overlayRect)
+                overlay.endRegion()
+
+    def renderWorld(self, surface):
+        """
+        Draws the background, the planets, the ship and the instruments
+        """
         surface.fill((10, 10, 30))
-        # Center the camera
-        half = pygame.Vector2(surface.get_size()) / 2
-        cam = self.ship.pos - half / self.zoom
 
-        # Draw planets
-        for planet in self.planets:
-            planet.render(surface, cam, self.zoom)
+        if self.zoom < LOD_ZOOM:
+            # Too far to see the planets one by one, draw their density instead
+            self.densityGrid.render(surface, self.camera, self.planetIndex, (10, 10, 30))
+        else:
+            # Draw planets, only those visible, from the pre-rendered sprites
+            rows, xs, ys, radii = self.camera.cull(self.planetIndex)
+            halos = np.isin(rows, [p.index for p in self.inRangePlanets])
+            self.planetSprites.draw(surface, self.planets.colors[rows], xs, ys, radii, halos)
 
         # Draw ship
-        self.ship.render(surface, cam, self.zoom)
-
-        for planet in self.planets:
-            planet.renderOverlay(surface, self.font, self.overlayRect)
-
-        # Debug info
-        fps = self.font.render(f"FPS: {self.game.clock.get_fps():.1f}", True, (200, 200, 50))
-        speed = self.font.render(f"Speed: {self.ship.vel.length():.1f}", True, (0, 255, 255))
-        zoom_txt = self.font.render(f"Zoom: {self.zoom:.2f}×", True, (200, 200, 200))
-        shipInfo = self.font.render(f"Ship: {self.ship.name}", True, (200, 100, 30))
-        shipPos = self.font.render(f"Pos: {self.ship.pos}", True, (200, 100, 30))
-        moneyInfo = self.font.render(f"Money: {self.game.getMoney()}", True, (200, 100, 30))
-        questInfo = self.font.render(f"Current Quest: {self.game.questManager.getActiveQuest()}", True, (200, 100, 30))
-        surface.blit(fps, (10, 10))
-        surface.blit(speed, (10, 30))
-        surface.blit(zoom_txt, (10, 50))
-        surface.blit(shipInfo, (10, 70))
-        surface.blit(shipPos, (10, 90))
-        surface.blit(moneyInfo, (10, 110))
-        surface.blit(questInfo, (10, 130))
+        self.ship.render(surface, self.camera.offset, self.zoom, self.alpha)
 
         self.renderMinimap(surface, self.zoom)
         self.renderQuestRadar(surface)
 
+    def hudLines(self):
+        """
+        Returns the debug info lines as a list of (surface, position)
+        The values that change every frame are not put in the text cache
+        """
+        volatile = self.font.renderUncached
+        lines = [
+            volatile(f"FPS: {self.game.clock.get_fps():.1f}", True, (200, 200, 50)),
+            volatile(f"Speed: {self.ship.vel.length():.1f}", True, (0, 255, 255)),
+            volatile(f"Zoom: {self.zoom:.2f}×", True, (200, 200, 200)),
+            self.font.render(f"Ship: {self.ship.name}", True, (200, 100, 30)),
+            volatile(f"Pos: {self.ship.pos}", True, (200, 100, 30)),
+            self.font.render(f"Money: {self.game.getMoney()}", True, (200, 100, 30)),
+            self.font.render(f"Current Quest: {self.game.questManager.getActiveQuest()}", True, (200, 100, 30)),
+            volatile(self.targetText(), True, (200, 100, 30)),
+            volatile(self.visibleText(), True, (200, 200, 200)),
+        ]
+        return [(line, (10, 10 + 20 * i)) for i, line in enumerate(lines)]
+
+    def targetText(self):
+        """
+        Returns the HUD line about the closest destination of the active quests
+        """
+        target = self.nearestTarget()
+        if target is None:
+            return "Nearest Target: none"
+        return f"Nearest Target: {target.name} ({target.pos.distance_to(self.ship.pos):.0f})"
+
+    def visibleText(self):
+        """
+        Returns the debug line about what is drawn in the world
+        """
+        if self.zoom < LOD_ZOOM:
+            return f"Visible: {self.densityGrid.visibleCount} cells (LOD)"
+        return f"Visible: {self.camera.visibleCount}/{self.camera.totalCount}"
+
     #=======================
     #=        Utils        =
     #= Minimap/Quest Radar =
     #=======================
     def renderMinimap(self, surface, zoom):
       """
-      Renders a simple minimap
+      Renders the minimap, its planets are cached and refreshed a few times per second
       surface: the pygame surface to draw to
       zoom: zoom level, used to scale the minimap
       """
-      w, h = surface.get_size()
-      mm_w, mm_h = 200, 120
-      mm_x = w - mm_w - 10
-      mm_y = h - mm_h - 10
-
-      # Background and border
-      mm_rect = pygame.Rect(mm_x, mm_y, mm_w, mm_h)
-      pygame.draw.rect(surface, (15, 15, 25), mm_rect)
-      pygame.draw.rect(surface, (100, 100, 140), mm_rect, 2)
-
-      VIEW_RANGE = 3000/zoom
-
-      # Convert from world coordinates to minimap coordinates
-      scale_x = mm_w / (2 * VIEW_RANGE)
-      scale_y = mm_h / (2 * VIEW_RANGE)
-
-      # The center of the minmap si the ship pos
-      # Compute the gap from the center for each object
-      center_mm_x = mm_x + mm_w // 2
-      center_mm_y = mm_y + mm_h // 2
-
-      for p in self.planets:
-          dx = p.pos.x - self.ship.pos.x
-          dy = p.pos.y - self.ship.pos.y
-
-          sx = int(center_mm_x + dx * scale_x)
-          sy = int(center_mm_y + dy * scale_y)
-
-          # Compute the radius on the minimap
-          r = max(2, int(p.radius * scale_x))
-
-          # Inflate the minimap rectangle to not display a planet that is out of bounds
-          visible_rect = mm_rect.inflate(r * 2, r * 2)
-          if not visible_rect.collidepoint(sx, sy):
-              continue
+      self.minimap.render(surface, self.planets, self.planetIndex, self.ship, zoom)
 
-          # Clip the planets to the surface,
-          # This tells Pygame to draw only in the minimap zone
-          surface.set_clip(mm_rect)
-          pygame.draw.circle(surface, p.color, (sx, sy), r)
-          surface.set_clip(None)
-
-          # Size of the point in correlation with the planet's radius but with a safeguard of 2 pixels
-          r = max(2, int(p.radius * scale_x))
-          pygame.draw.circle(surface, p.color, (sx, sy), r)
-
-
-          # Display the name of the planet if we are near
-          if abs(dx) < VIEW_RANGE * 0.5 and abs(dy) < VIEW_RANGE * 0.5:
-              label = self.font.render(p.name, True, (180, 180, 180))
-              surface.blit(label, (sx + r + 2, sy - 6))
-
-      # Player's ship is at the center of the minimap
-      pygame.draw.circle(surface, (255, 255, 255), (center_mm_x, center_mm_y), 4)
-
-      # A small direction indicator
-      rad = math.radians(self.ship.angle - 90)
-      tip_x = int(center_mm_x + math.cos(rad) * 8)
-      tip_y = int(center_mm_y + math.sin(rad) * 8)
-      pygame.draw.line(surface, (255, 255, 100), (center_mm_x, center_mm_y), (tip_x, tip_y), 2)
+    def radarTarget(self):
+      """
+      Returns (position, is a giver) of what the radar points at:
+      the quest destination, or the nearest quest giver when no quest is tracked
+      None if there is nothing to point at
+      """
+      quest = self.game.questManager.getActiveQuestPos()
+      if quest is not None:
+        return (tuple(quest), False)
+      giver = self.nearestGiver()
+      if giver is None:
+        return None
+      return (tuple(giver.pos), True)
 
     def renderQuestRadar(self, surface):
       """
-      Renders an arrow to the quest destination, the colour depends on the distance
+      Renders an arrow to the quest destination, the colour depends on the distance,
+      or a yellow arrow to the nearest quest giver
       """
 
-      quest = self.game.questManager.getActiveQuestPos()
-      if quest is None:
+      target = self.radar
+      if target is None:
         return
       radarX = surface.get_width() - 120
       radarY = surface.get_height() - 200
 
-      direction = quest - self.ship.pos
+      direction = pygame.Vector2(target[0]) - self.ship.pos
       dist = direction.length()
+      # Already there, no direction to show
+      if dist == 0:
+        return
 
       # Normalise direction
       direction = direction.normalize()
@@ -298,5 +435,7 @@ class GameScreen(Screen):
 
       ratio = max(0, min(1, dist / 50000))
       color = ( int(255*(1-ratio)), 0, int(255*ratio))
+      if target[1]:
+        color = GIVER_RADAR_COLOR
 
       pygame.draw.polygon(surface, color, [p1, p2, p3])
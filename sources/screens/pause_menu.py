@@ -45,13 +45,16 @@ class PauseMenu(Screen):
         self.game.currentScreen = self.game.gameScreen
 
     def saveAndQuit(self):
-        self.game.saveGame()
+        self.game.closeGame()
         self.game.displayMenu()
 
     def handleEvent(self, event):
         for btn in self.buttons:
             btn.handleEvent(event)
 
+    def renderKey(self):
+        return tuple(btn.renderKey() for btn in self.buttons)
+
     def render(self, surface):
         surface.fill((0, 0, 0))
         self.text = self.font.render("Pause", True, (255, 255, 255))
@@ -110,6 +110,15 @@ class SettingsScreen(Screen):
       # Static screen
       pass
 
+    def renderKey(self):
+        return (
+            self._settings["fps"],
+            tuple(self._settings["resolution"]),
+            self._settings["fullscreen"],
+            self._applyButton.renderKey(),
+            self._resetButton.renderKey(),
+        )
+
     def render(self, surface):
         surface.fill((20, 20, 40))
 
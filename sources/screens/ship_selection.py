@@ -37,6 +37,8 @@ class ShipSelectionScreen(Screen):
         self._selectedForPreview = None
     def _selectShip(self, ship):
         self._game.setSelectedShip(ship)
+        # Bake the rotations now, so the first seconds of flight don't pay for them
+        ship.getSpriteCache().prebake()
         print(f"[ShipSelection] Vaisseau sélectionné : {ship.getName()}")
         self._game.displayMenu()
 
@@ -59,6 +61,17 @@ class ShipSelectionScreen(Screen):
                 self._selectedForPreview = availableShips[i]
                 break
 
+    def renderKey(self):
+        preview = self._selectedForPreview
+        # The preview shows the sprite cache, which fills in the background
+        cache = len(preview.getSpriteCache()) if preview else None
+        return (
+            preview,
+            cache,
+            tuple(button.renderKey() for button in self._buttons),
+            self._backButton.renderKey(),
+        )
+
     def render(self, surface):
         surface.fill((15, 15, 35))
 
@@ -105,6 +118,7 @@ class ShipSelectionScreen(Screen):
             f"Accélération: {ship.getAcceleration():.0f}",
             f"Vitesse max: {ship.getMaxSpeed():.0f}",
             f"Rotation: {ship.getTurnSpeed():.0f}°/s",
+            f"Cache: {len(ship.getSpriteCache())} sprites, {ship.getSpriteCache().memoryUsage() / 1024:.0f} Ko",
         ]
 
         for stat in stats:
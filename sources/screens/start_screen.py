@@ -1,7 +1,23 @@
+import time
+
 import pygame
 
 from screens.base_screen import Screen
 from ui.button import Button
+from utils.save_manager import SLOT_COUNT
+
+
+def slotText(slot, meta):
+    """
+    Describes a save slot from its metadata (see utils/save_manager.listSaves)
+    """
+    if meta is None:
+        return f"Emplacement {slot} : vide"
+    minutes = int(meta.get("playtime") or 0) // 60
+    text = f"Emplacement {slot} : {meta['ship']}, {meta['money']:,} ¢, {minutes // 60}h{minutes % 60:02d}"
+    if meta.get("timestamp"):
+        text += time.strftime(", %d/%m/%Y %H:%M", time.localtime(meta["timestamp"]))
+    return text
 
 
 class StartOptions(Screen):
@@ -10,52 +26,88 @@ class StartOptions(Screen):
         self.width = width
         self.height = height
         self.font = font
-        self.data = game.getSaveData()
+        self.data = None
+        # Slot whose save the player agreed to overwrite with a new game
+        self.confirmedSlot = None
+        # Only the metadata of the saves, the selected one is loaded when chosen
+        self.saves = game.getSaves()
 
+        top = self.height // 2 - 50 * SLOT_COUNT
+        self.slotButtons = [
+            Button(
+                slotText(slot, None),
+                (self.width // 2, top + 50 * i),
+                lambda slot=slot: self.selectSlot(slot),
+                font,
+            )
+            for i, slot in enumerate(range(1, SLOT_COUNT + 1))
+        ]
         self.buttons = [
             Button(
               "Nouvelle Partie",
-              (self.width // 2, self.height // 2 - 50),
+              (self.width // 2, self.height // 2 + 50),
               self.newGame,
               font
             ),
             Button(
                 "Charger la partie",
-                (self.width // 2, self.height // 2),
+                (self.width // 2, self.height // 2 + 100),
                 self.loadGame,
                 font,
             ),
             Button(
                 "Retour",
-                (self.width // 2, self.height // 2 + 50),
+                (self.width // 2, self.height // 2 + 150),
                 self.game.displayMenu,
                 font,
             ),
-        ]
+        ] + self.slotButtons
 
     def onEnter(self):
-        self.data = self.game.getSaveData()
-        if self.data is not None:
-            saveExists = True
-        else:
-            saveExists = False
+        self.saves = self.game.getSaves()
+        self.selectSlot(self.game.slot)
 
-        self.buttons[1].setDisabled(not saveExists)
+    def selectSlot(self, slot):
+        """
+        Selects the slot new games are saved in and loaded from
+        """
+        self.game.slot = slot
+        self.confirmedSlot = None
+        self.buttons[0].setText("Nouvelle Partie")
+        for i, button in enumerate(self.slotButtons):
+            text = slotText(i + 1, self.saves.get(i + 1))
+            button.setText(f"> {text} <" if i + 1 == slot else text)
+        self.buttons[1].setDisabled(slot not in self.saves)
 
     def newGame(self):
+        """
+        Starts a new game in the selected slot, its first save is written right away
+        so a slot that has a save asks to click again before it is overwritten
+        (headless games never write it)
+        """
+        slot = self.game.slot
+        if slot in self.saves and not self.game.headless and self.confirmedSlot != slot:
+            self.confirmedSlot = slot
+            self.buttons[0].setText(f"Écraser l'emplacement {slot} ?")
+            return
         self.game.gameScreen.loadShip(
             self.game.selectedShip,
             pos=pygame.Vector2(0, 0),
             vel=pygame.Vector2(0, 0),
             angle=90,
         )
-        self.game.gameScreen.generatePlanets(count=1200, spread=80000, minDistance=300)
+        self.game.amount = 0
+        self.game.playtime = 0.0
+        self.game.phtonos.add(self.game, 100)
         self.game.initQuestManager()
-        self.game.questManager.generateQuests()
+        self.game.gameScreen.startUniverse()
+        self.game.startJournal()
         self.game.currentScreen = self.game.gameScreen
 
     def loadGame(self):
         self.data = self.game.getSaveData()
+        if self.data is None:
+            return
         self.game.gameScreen.loadShip(
             self.data["ship"],
             self.data["pos"],
@@ -63,16 +115,27 @@ class StartOptions(Screen):
             self.data["angle"],
         )
 
-        self.game.gameScreen.loadPlanets(self.data["planets"])
+        self.game.amount = self.data["money"]
+        self.game.playtime = self.data.get("playtime") or 0.0
         self.game.initQuestManager()
+        if "planets" in self.data:
+          self.game.gameScreen.loadPlanets(self.data["planets"], self.data.get("seed"))
+        else:
+          self.game.gameScreen.startUniverse(self.data["seed"], self.data.get("chunks", []))
         if "quests" in self.data:
           self.game.questManager.fromDict(self.data["quests"])
+          # Saves made before the chunks were released also kept those of the completed quests
+          self.game.questManager.keepQuestChunks()
+        self.game.startJournal(self.data)
         self.game.currentScreen = self.game.gameScreen
 
     def handleEvent(self, event):
         for btn in self.buttons:
             btn.handleEvent(event)
 
+    def renderKey(self):
+        return tuple(btn.renderKey() for btn in self.buttons)
+
     def render(self, surface):
         surface.fill((0, 0, 0))
         self.text = self.font.render("Choisissez une option", True, (255, 255, 255))
@@ -1,7 +1,7 @@
 import pygame
 from screens.base_screen import Screen
 from ui.button import Button
-from ressources.ressources import getMusicPath
+from ressources.ressources import playMusic
 
 
 class TitleScreen(Screen):
@@ -9,6 +9,7 @@ class TitleScreen(Screen):
         self._game = game
         self._font = font
         self._fontTitle = titleFont
+        self._moneyBg = None
 
         centerX = width // 2
         startY = height // 2 - 100
@@ -41,9 +42,7 @@ class TitleScreen(Screen):
         ]
 
     def onEnter(self):
-      pygame.mixer.music.stop()
-      pygame.mixer.music.load(getMusicPath("menu.wav"))
-      pygame.mixer.music.play(-1)
+      playMusic("menu.wav")
 
     def handleEvent(self, event):
         for button in self._buttons:
@@ -53,6 +52,13 @@ class TitleScreen(Screen):
       # Static screen
       pass
 
+    def renderKey(self):
+      return (
+          self._game.getMoney(),
+          self._game.getSelectedShip(),
+          tuple(button.renderKey() for button in self._buttons),
+      )
+
     def render(self, surface):
       surface.fill((5, 5, 20))
 
@@ -69,9 +75,11 @@ class TitleScreen(Screen):
       moneyRect = moneyText.get_rect(center=(surface.get_width() // 2, 150))
 
       bgRect = moneyRect.inflate(20, 10)
-      bgSurface = pygame.Surface(bgRect.size, pygame.SRCALPHA)
-      bgSurface.fill((255, 255, 0, 128))
-      surface.blit(bgSurface, bgRect)
+      # Only rebuilt when the money text changes size
+      if self._moneyBg is None or self._moneyBg.get_size() != bgRect.size:
+          self._moneyBg = pygame.Surface(bgRect.size, pygame.SRCALPHA)
+          self._moneyBg.fill((255, 255, 0, 128))
+      surface.blit(self._moneyBg, bgRect)
       surface.blit(moneyText, moneyRect)
 
       selectedShip = self._game.getSelectedShip()
@@ -108,6 +108,12 @@ class Button:
         textPos = (self._rect.x + self._padding[0], self._rect.y + self._padding[1])
         surface.blit(self._textSurface, textPos)
 
+    def renderKey(self):
+        """
+        Everything that changes how the button looks
+        """
+        return (self._text, self._disabled, self.isHovered(), self._rect.topleft)
+
     def isHovered(self):
         mousePos = pygame.mouse.get_pos()
         return self._rect.collidepoint(mousePos)
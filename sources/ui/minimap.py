@@ -0,0 +1,153 @@
+"""
+Minimap
+The planets are drawn in an offscreen surface a few times per second,
+the cached surface is blitted every frame and only the ship marker is drawn live.
+Zoomed out, or when too many planets are in range, their density is drawn instead (see rendering/density_grid.py)
+"""
+
+import math
+
+import numpy as np
+import pygame
+
+from rendering.camera import Camera
+from rendering.density_grid import LOD_ZOOM, DensityGrid
+
+# Refreshes of the planets per second
+REFRESH_RATE = 10
+
+# World units shown from the center to the border at zoom 1
+VIEW_RANGE = 3000
+
+# More planets in range than that and their density is drawn instead
+MAX_PLANETS = 2000
+
+# Names shown at most, those of the planets closest to the ship
+MAX_LABELS = 10
+
+
+class Minimap:
+    def __init__(self, font, size=(200, 120), refreshRate=REFRESH_RATE, viewRange=VIEW_RANGE):
+        """
+        font: font of the planet labels
+        size: size of the minimap in pixels
+        refreshRate: how many times per second the planets are redrawn
+        viewRange: world units shown from the center to the border, at zoom 1
+        """
+        self.font = font
+        self.size = size
+        self.refreshRate = refreshRate
+        self.viewRange = viewRange
+        self.surface = pygame.Surface(size)
+        # Square view of the density, scaled to the size of the minimap
+        self.densityCamera = Camera(size[0], size[0])
+        self.densityGrid = DensityGrid(minCellPixels=1)
+        self._sinceRefresh = math.inf
+        self._indexRevision = None
+
+    def update(self, dt):
+        self._sinceRefresh += dt
+
+    def invalidate(self):
+        """
+        Forces a refresh on the next render
+        """
+        self._sinceRefresh = math.inf
+
+    def rect(self, surface):
+        """
+        Where the minimap goes on the surface (bottom right corner)
+        """
+        w, h = surface.get_size()
+        mmW, mmH = self.size
+        return pygame.Rect(w - mmW - 10, h - mmH - 10, mmW, mmH)
+
+    def refresh(self, planets, index, center, zoom):
+        """
+        Redraws the planets around "center" in the offscreen surface
+        planets: the PlanetStore
+        index: the SpatialHash over it, only the planets in range are looked at
+        """
+        self._sinceRefresh = 0
+        self._indexRevision = index.revision
+        mmW, mmH = self.size
+        surface = self.surface
+        surface.fill((15, 15, 25))
+
+        viewRange = self.viewRange / zoom
+
+        # Convert from world coordinates to minimap coordinates
+        scaleX = mmW / (2 * viewRange)
+        scaleY = mmH / (2 * viewRange)
+
+        # The center of the minimap is the ship pos
+        shipX, shipY = center[0], center[1]
+        rows = None
+        if zoom >= LOD_ZOOM:
+            rows = index.queryRect(shipX - viewRange, shipY - viewRange, 2 * viewRange, 2 * viewRange)
+        if rows is None or len(rows) > MAX_PLANETS:
+            self.refreshDensity(index, center, scaleX)
+        else:
+            self.refreshPlanets(planets, rows, center, viewRange, scaleX, scaleY)
+
+        pygame.draw.rect(surface, (100, 100, 140), surface.get_rect(), 2)
+
+    def refreshPlanets(self, planets, rows, center, viewRange, scaleX, scaleY):
+        """
+        Draws the planets of the rows one by one, and the names of the closest ones
+        """
+        mmW, mmH = self.size
+        surface = self.surface
+        # Project all the nearby planets at once
+        delta = planets.positions[rows] - (center[0], center[1])
+        xs = (mmW // 2 + delta[:, 0] * scaleX).astype(np.int64)
+        ys = (mmH // 2 + delta[:, 1] * scaleY).astype(np.int64)
+        # Size of the point in correlation with the planet's radius but with a safeguard of 2 pixels
+        radii = np.maximum(2, (planets.radii[rows] * scaleX).astype(np.int64))
+        colors = planets.colors[rows].tolist()
+        for x, y, r, color in zip(xs.tolist(), ys.tolist(), radii.tolist(), colors):
+            # The surface clips what is out of the minimap
+            pygame.draw.circle(surface, color, (x, y), r)
+
+        # Display the name of the planets if we are near
+        near = np.flatnonzero((np.abs(delta) < viewRange * 0.5).all(axis=1))
+        if len(near) > MAX_LABELS:
+            near = near[np.argsort(np.hypot(*delta[near].T))[:MAX_LABELS]]
+        surface.fblits([
+            (self.font.render(planets.names[rows[i]], True, (180, 180, 180)), (xs[i] + radii[i] + 2, ys[i] - 6))
+            for i in near.tolist()
+        ])
+
+    def refreshDensity(self, index, center, scale):
+        """
+        Draws the density of the planets, the minimap squashes a square view of it
+        scale: minimap pixels per world unit, along x
+        """
+        mmW, mmH = self.size
+        view = pygame.Surface((mmW, mmW))
+        view.fill((15, 15, 25))
+        self.densityCamera.follow(center, scale)
+        self.densityGrid.render(view, self.densityCamera, index, (15, 15, 25))
+        self.surface.blit(pygame.transform.scale(view, self.size), (0, 0))
+
+    def render(self, surface, planets, index, ship, zoom):
+        """
+        Draws the minimap on the surface, refreshing the planets if it is time
+        ship: the player's ship, its marker is drawn every frame
+        zoom: zoom level, used to scale the minimap
+        """
+        stale = self._sinceRefresh >= 1 / self.refreshRate or index.revision != self._indexRevision
+        if stale:
+            self.refresh(planets, index, ship.pos, zoom)
+
+        rect = self.rect(surface)
+        surface.blit(self.surface, rect)
+
+        # Player's ship is at the center of the minimap
+        center = rect.center
+        pygame.draw.circle(surface, (255, 255, 255), center, 4)
+
+        # A small direction indicator
+        rad = math.radians(ship.angle - 90)
+        tip = (int(center[0] + math.cos(rad) * 8), int(center[1] + math.sin(rad) * 8))
+        pygame.draw.line(surface, (255, 255, 100), center, tip, 2)
@@ -0,0 +1,109 @@
+"""
+Profiler overlay
+Shows the percentiles of the frame phases and a graph of the last frame times,
+in the top right corner, on top of any screen.
+The panel is only redrawn a few times per second
+"""
+
+import time
+
+import pygame
+
+from ressources.ressources import getTextCache
+from utils.frame_profiler import PHASES
+
+# Redraws of the panel per second
+REFRESH_RATE = 4
+
+# Frame time at the top of the graph, in milliseconds
+GRAPH_MAX_MS = 50
+
+BACKGROUND = (20, 20, 30)
+TEXT_COLOR = (220, 220, 220)
+TITLE_COLOR = (255, 255, 120)
+
+
+class ProfilerOverlay:
+    def __init__(self, font, width=360, graphHeight=60):
+        """
+        font: font of the panel
+        width: width of the panel in pixels, also the number of frames in the graph
+        graphHeight: height of the frame time graph
+        """
+        self.font = font
+        self.width = width
+        self.graphHeight = graphHeight
+        self._lastRefresh = 0.0
+
+    def rect(self, screenSize):
+        lineHeight = self.font.get_linesize()
+        # Title, header, phases, work, frame and text cache
+        height = lineHeight * (len(PHASES) + 5) + self.graphHeight + 20
+        return pygame.Rect(screenSize[0] - self.width - 10, 10, self.width, height)
+
+    def text(self, surface, text, pos, color=TEXT_COLOR, right=False):
+        # Drawn with a background, so the numbers don't fill the text cache
+        img = self.font.render(text, True, color, BACKGROUND)
+        surface.blit(img, img.get_rect(topright=pos) if right else pos)
+
+    def row(self, surface, cells, x, y, color=TEXT_COLOR):
+        """
+        Draws a line of the table, the first cell on the left, the others right aligned in columns
+        """
+        self.text(surface, cells[0], (x, y), color)
+        for i, cell in enumerate(cells[1:]):
+            self.text(surface, cell, (x + 150 + 60 * i, y), color, right=True)
+
+    def renderPanel(self, surface, rect, profiler):
+        """
+        Draws the panel in rect
+        """
+        pygame.draw.rect(surface, BACKGROUND, rect)
+        pygame.draw.rect(surface, (100, 100, 140), rect, 1)
+        x, y = rect.x + 10, rect.y + 6
+        lineHeight = self.font.get_linesize()
+        self.text(surface, f"Profiler, {min(profiler.count, profiler.capacity)} frames (F3 hide, F4 export)", (x, y), TITLE_COLOR)
+        y += lineHeight
+        self.row(surface, ("ms", "p50", "p95", "p99"), x, y, TITLE_COLOR)
+        y += lineHeight
+        stats = profiler.stats()
+        for name in PHASES + ("work", "frame"):
+            values = stats.get(name, (0, 0, 0))
+            self.row(surface, (name,) + tuple(f"{v:.2f}" for v in values), x, y)
+            y += lineHeight
+        textCache = getTextCache()
+        self.text(surface, f"Text cache: {textCache.hits} hits / {textCache.misses} misses", (x, y))
+        y += lineHeight
+
+        # Frame times of the last frames, one pixel per frame, with the 60 and 30 FPS lines
+        graph = pygame.Rect(rect.x + 5, y + 6, rect.w - 10, self.graphHeight)
+        pygame.draw.rect(surface, (10, 10, 15), graph)
+        scale = graph.h / GRAPH_MAX_MS
+        for ms, color in ((1000 / 60, (60, 140, 60)), (1000 / 30, (140, 60, 60))):
+            lineY = graph.bottom - int(ms * scale)
+            pygame.draw.line(surface, color, (graph.x, lineY), (graph.right - 1, lineY))
+        frameTimes = profiler.samples()[1][-graph.w:] * 1000
+        for i, ms in enumerate(frameTimes.tolist()):
+            height = min(graph.h, int(ms * scale))
+            color = (120, 200, 120) if ms <= 1000 / 60 else (220, 180, 80) if ms <= 1000 / 30 else (230, 80, 80)
+            barX = graph.right - len(frameTimes) + i
+            pygame.draw.line(surface, color, (barX, graph.bottom - 1), (barX, graph.bottom - height))
+
+    def draw(self, compositor, profiler):
+        """
+        Draws the panel in the overlay layer of the compositor when the profiler is enabled,
+        removes it when it was just disabled
+        """
+        overlay = compositor.layer("overlay")
+        if not profiler.enabled:
+            if "profiler" in overlay.regions:
+                overlay.removeRegion("profiler")
+            return
+        now = time.perf_counter()
+        # The compositor forgets the regions when the screen changes
+        if "profiler" in overlay.regions and now - self._lastRefresh < 1 / REFRESH_RATE:
+            return
+        self._lastRefresh = now
+        rect = self.rect(compositor.size)
+        self.renderPanel(overlay.beginRegion("profiler", rect), rect, profiler)
+        overlay.endRegion()
@@ -0,0 +1,51 @@
+"""
+Save indicator
+Shows the state of the background save (see utils/save_manager.py)
+in the bottom left corner, on top of any screen
+"""
+
+import time
+
+# Seconds the result of a save stays on screen
+SAVED_DURATION = 3.0
+FAILED_DURATION = 8.0
+
+SAVING_COLOR = (220, 220, 220)
+SAVED_COLOR = (120, 220, 120)
+FAILED_COLOR = (230, 80, 80)
+
+
+class SaveIndicator:
+    def __init__(self, font):
+        """
+        font: font of the message
+        """
+        self.font = font
+
+    def message(self, saver):
+        """
+        Returns (text, color) of the message to show, None when there is nothing to show
+        """
+        status = saver.status
+        if status == "saving":
+            return "Sauvegarde en cours...", SAVING_COLOR
+        elapsed = time.monotonic() - saver.finishedAt
+        if status == "saved" and elapsed < SAVED_DURATION:
+            return "Partie sauvegardée", SAVED_COLOR
+        if status == "failed" and elapsed < FAILED_DURATION:
+            return f"Échec de la sauvegarde : {saver.error}", FAILED_COLOR
+        return None
+
+    def draw(self, compositor, saver):
+        """
+        Puts the message in the overlay layer of the compositor, removes it when there is none
+        """
+        overlay = compositor.layer("overlay")
+        message = self.message(saver)
+        if message is None:
+            if "save" in overlay.regions:
+                overlay.removeRegion("save")
+            return
+        # Comes from the text cache, put() only redraws when the message changes
+        img = self.font.render(message[0], True, message[1])
+        overlay.put("save", [(img, (10, compositor.size[1] - img.get_height() - 10))])
@@ -0,0 +1,44 @@
+"""
+Fixed timestep
+The simulation advances in steps of the same length whatever the frame rate,
+so the physics behave the same at 30 or 360 FPS.
+The time left between two steps is given to the renderer (alpha)
+to interpolate between the previous and the current state
+"""
+
+# Simulation steps per second
+TICK_RATE = 60
+
+# Maximum number of steps per frame, after a long hitch the extra time is dropped
+# instead of making the next frames even slower (spiral of death)
+MAX_STEPS = 15
+
+
+class FixedTimestep:
+    def __init__(self, tickRate=TICK_RATE, maxSteps=MAX_STEPS):
+        """
+        tickRate: simulation steps per second
+        maxSteps: maximum number of steps per frame
+        """
+        self.dt = 1 / tickRate
+        self.maxSteps = maxSteps
+        self.accumulator = 0.0
+        # Part of a step left over, between 0 and 1
+        self.alpha = 0.0
+        # Debug stat: steps run in the last frame and time dropped since the start
+        self.steps = 0
+        self.dropped = 0.0
+
+    def advance(self, frameTime):
+        """
+        Adds the time of a frame and returns how many steps must be simulated
+        """
+        self.accumulator += frameTime
+        steps = min(int(self.accumulator / self.dt), self.maxSteps)
+        self.accumulator -= steps * self.dt
+        if steps == self.maxSteps and self.accumulator >= self.dt:
+            self.dropped += self.accumulator
+            self.accumulator = 0.0
+        self.alpha = self.accumulator / self.dt
+        self.steps = steps
+        return steps
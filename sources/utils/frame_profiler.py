@@ -0,0 +1,114 @@
+"""
+Frame profiler
+Times the phases of every frame of Game.run in a ring buffer,
+to get percentiles and a graph of the frame times (see ui/profiler_overlay.py)
+and to export them so the stutters can be looked at later.
+Nothing is recorded while it is disabled
+"""
+
+import json
+import time
+
+import numpy as np
+
+# Phases of a frame, in the order they happen in Game.run
+PHASES = ("events", "handleEvent", "update", "render", "flip")
+PHASE_INDEX = {name: i for i, name in enumerate(PHASES)}
+
+# Number of frames kept
+CAPACITY = 600
+
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    def __init__(self, capacity=CAPACITY):
+        """
+        capacity: number of frames kept in the ring buffer
+        """
+        self.enabled = False
+        self.capacity = capacity
+        # Seconds spent in each phase, one row per frame
+        self.timings = np.zeros((capacity, len(PHASES)))
+        # Time between two frames (clock.tick), includes the wait for the FPS cap
+        self.frameTimes = np.zeros(capacity)
+        # Number of frames recorded since enabled
+        self.count = 0
+        self._row = 0
+        self._last = 0.0
+
+    def toggle(self):
+        """
+        Enables or disables the recording, enabling starts a new recording
+        """
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.count = 0
+        print(f"[Profiler] {'Enabled' if self.enabled else 'Disabled'}")
+
+    def begin(self, frameTime):
+        """
+        Starts a frame
+        frameTime: seconds since the previous frame
+        """
+        self._row = self.count % self.capacity
+        self.frameTimes[self._row] = frameTime
+        self.timings[self._row] = 0
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        """
+        Ends a phase, its time is the time since the previous mark
+        """
+        now = time.perf_counter()
+        self.timings[self._row, PHASE_INDEX[phase]] += now - self._last
+        self._last = now
+
+    def end(self):
+        self.count += 1
+
+    def samples(self):
+        """
+        Returns the (timings, frameTimes) of the recorded frames, oldest first
+        """
+        size = min(self.count, self.capacity)
+        if self.count <= self.capacity:
+            return self.timings[:size], self.frameTimes[:size]
+        start = self.count % self.capacity
+        order = np.r_[start:self.capacity, 0:start]
+        return self.timings[order], self.frameTimes[order]
+
+    def stats(self):
+        """
+        Returns {name: (p50, p95, p99)} in milliseconds,
+        for every phase, "work" (all the phases) and "frame" (time between frames)
+        """
+        timings, frameTimes = self.samples()
+        if not len(frameTimes):
+            return {}
+        columns = dict(zip(PHASES, timings.T))
+        columns["work"] = timings.sum(axis=1)
+        columns["frame"] = frameTimes
+        return {
+            name: tuple(np.percentile(values, PERCENTILES) * 1000)
+            for name, values in columns.items()
+        }
+
+    def export(self, path):
+        """
+        Writes the recorded frames to a .csv or .jsonl file (times in milliseconds)
+        """
+        timings, frameTimes = self.samples()
+        first = self.count - len(frameTimes)
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".csv"):
+                f.write(",".join(("frame", "frameMs") + PHASES) + "\n")
+                for i, (row, frameTime) in enumerate(zip(timings * 1000, frameTimes * 1000)):
+                    f.write(f"{first + i},{frameTime:.4f}," + ",".join(f"{t:.4f}" for t in row) + "\n")
+            else:
+                for i, (row, frameTime) in enumerate(zip(timings * 1000, frameTimes * 1000)):
+                    record = {"frame": first + i, "frameMs": round(frameTime, 4)}
+                    record.update({name: round(t, 4) for name, t in zip(PHASES, row)})
+                    f.write(json.dumps(record) + "\n")
+        print(f"[Profiler] {len(frameTimes)} frames exported to {path}")
+        return path
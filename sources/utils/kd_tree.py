@@ -0,0 +1,138 @@
+"""
+KD-tree
+A static tree over the positions of a PlanetStore, answers "what is near" questions
+(k nearest, within a radius, nearest matching a condition) without looking at everything.
+It is built in bulk with NumPy and rebuilt when the planets change (see GameScreen.planetTree),
+the leaves are tested with NumPy too, only the walk down the tree is Python
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+# Planets per leaf, a leaf is tested in one NumPy call
+LEAF_SIZE = 32
+
+
+class KDTree:
+    def __init__(self, store, revision=None):
+        """
+        Builds the tree over every row of the store
+        store: the PlanetStore
+        revision: revision of the SpatialHash the rows come from, tells when to rebuild
+        """
+        self.store = store
+        self.revision = revision
+        n = len(store)
+        self.count = n
+        # Every leaf has the same depth, node i has children 2i+1 and 2i+2
+        self.depth = max(0, math.ceil(math.log2(n / LEAF_SIZE))) if n else 0
+        nodes = 2 ** self.depth - 1
+        self.axes = np.zeros(nodes, dtype=np.int8)
+        self.splits = np.zeros(nodes, dtype=np.float64)
+        # Rows sorted so that every node covers a slice of them
+        order = np.arange(n, dtype=np.int64)
+        positions = store.positions[:n]
+        self._build(order, positions, 0, 0, n)
+        self.rows = order
+        self.points = np.ascontiguousarray(positions[order])
+
+    def _build(self, order, positions, node, start, end):
+        """
+        Splits order[start:end] at its median along the widest axis, then its halves
+        """
+        if node >= len(self.axes):
+            return
+        mid = (start + end) // 2
+        if end - start > 1:
+            points = positions[order[start:end]]
+            axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+            part = np.argpartition(points[:, axis], mid - start)
+            order[start:end] = order[start:end][part]
+            self.axes[node] = axis
+            self.splits[node] = positions[order[mid], axis]
+        self._build(order, positions, 2 * node + 1, start, mid)
+        self._build(order, positions, 2 * node + 2, mid, end)
+
+    def __len__(self):
+        return self.count
+
+    def _leaves(self, point, bound):
+        """
+        Walks the tree from the leaf containing point, yields the (start, end) slices
+        of the leaves closer than bound() (a squared distance, read again after each leaf)
+        """
+        px, py = float(point[0]), float(point[1])
+        first = len(self.axes)
+        # (squared distance to the node at least, node, start, end)
+        stack = [(0.0, 0, 0, self.count)]
+        while stack:
+            distance, node, start, end = stack.pop()
+            if distance > bound():
+                continue
+            while node < first:
+                mid = (start + end) // 2
+                diff = (px, py)[self.axes[node]] - self.splits[node]
+                # The far side is at least as far as the splitting line
+                if diff < 0:
+                    stack.append((max(distance, diff * diff), 2 * node + 2, mid, end))
+                    node, end = 2 * node + 1, mid
+                else:
+                    stack.append((max(distance, diff * diff), 2 * node + 1, start, mid))
+                    node, start = 2 * node + 2, mid
+            if start < end:
+                yield start, end
+
+    def nearest(self, point, k=1, predicate=None, maxDistance=math.inf):
+        """
+        Returns the rows of the k planets closest to point (centers), closest first
+        predicate: only the rows for which predicate(row) is True are returned,
+                   it is only called on the rows that would make it in the result
+        maxDistance: rows further than that are ignored
+        """
+        if k <= 0:
+            return []
+        point = np.array((point[0], point[1]), dtype=np.float64)
+        # Max heap of the best rows so far, as (-squared distance, row)
+        best = []
+        limit = maxDistance * maxDistance
+
+        def bound():
+            return -best[0][0] if len(best) == k else limit
+
+        for start, end in self._leaves(point, bound):
+            distances = ((self.points[start:end] - point) ** 2).sum(axis=1)
+            worst = bound()
+            for i in np.argsort(distances).tolist():
+                distance = float(distances[i])
+                if distance > worst:
+                    break
+                row = int(self.rows[start + i])
+                if predicate is not None and not predicate(row):
+                    continue
+                if len(best) == k:
+                    heapq.heapreplace(best, (-distance, row))
+                else:
+                    heapq.heappush(best, (-distance, row))
+                worst = bound()
+        return [row for _, row in sorted(best, key=lambda item: -item[0])]
+
+    def nearestMatching(self, point, predicate, maxDistance=math.inf):
+        """
+        Returns the row of the closest planet for which predicate(row) is True, None if there is none
+        """
+        rows = self.nearest(point, 1, predicate, maxDistance)
+        return rows[0] if rows else None
+
+    def withinRadius(self, point, radius):
+        """
+        Returns the rows (array) of the planets whose center is within radius of point
+        """
+        point = np.array((point[0], point[1]), dtype=np.float64)
+        limit = radius * radius
+        found = []
+        for start, end in self._leaves(point, lambda: limit):
+            distances = ((self.points[start:end] - point) ** 2).sum(axis=1)
+            found.append(self.rows[start:end][distances <= limit])
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
@@ -1,15 +1,26 @@
 # The money manager, named after the Greek god of greed.
 
 class Phtonos:
-    def __init__(self) -> None:
-        pass
+    def __init__(self, journal=None, account=None) -> None:
+        """
+        journal: save journal the transactions of "account" are recorded in
+        account: the target whose money is saved (the game)
+        """
+        self.journal = journal
+        self.account = account
+
+    def record(self, target, amount) -> None:
+        if self.journal is not None and target is self.account:
+            self.journal.record("money", delta=amount, balance=target.amount)
 
     def add(self, target, amount) -> int:
         target.amount += amount
+        self.record(target, amount)
         return amount
 
     def remove(self, target, amount) -> int:
         target.amount -= amount
+        self.record(target, -amount)
         return amount
 
     def transfer(self, source, destination, amount) -> int:
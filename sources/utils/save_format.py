@@ -0,0 +1,372 @@
+"""
+Binary save format
+    magic "SGSV" | version (u16) | reserved (u16) | header length (u32)
+    header: JSON with the small values (ship, money, seed...) and the table of sections
+    sections: raw little endian NumPy arrays, each one aligned on 64 bytes
+
+The planets are stored by columns (positions, radii, colors, type ids, ids, name ids)
+and the quests as fixed size records referring to the planets by id.
+Names are interned in a single string table, planets refer to them by their index in it.
+Version 1 saves had no planet ids, their quests referred to the names of the planets.
+Version 2 quest records had no epoch, the saves held the quest of every planet
+The sections are not compressed, so they can be read straight from the file:
+readSave maps it in memory and only the pages of the planets that are used are read
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from entities.planet_store import PlanetStore
+
+MAGIC = b"SGSV"
+VERSION = 3
+
+# magic, version, reserved, header length
+PREAMBLE = struct.Struct("<4sHHI")
+
+ALIGNMENT = 64
+
+# Index of a quest type in a quest record
+QUEST_TYPES = ("delivery",)
+
+# giver and destination are planet ids (index in the string table of their name in version 1)
+# epoch: period of play the quest was offered in (see QuestManager.epoch), since version 3
+QUEST_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("reward", "<i8"),
+    ("giver", "<i8"),
+    ("destination", "<i8"),
+    ("type", "u1"),
+    ("completed", "?"),
+    ("epoch", "<u4"),
+])
+
+# Values of the save data stored in the header, everything else goes in sections
+# journal: generation of the save, see utils/save_journal.py
+HEADER_KEYS = (
+    "ship", "pos", "vel", "angle", "zoom", "money", "seed", "chunks", "journal",
+    "playtime", "planetCount", "timestamp",
+)
+
+# Values describing a save in the menus, read without the sections (see readMeta)
+META_KEYS = ("version", "money", "ship", "playtime", "planetCount", "timestamp")
+
+
+class SaveFormatError(Exception):
+    pass
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class StringTable:
+    """
+    Interns strings, each distinct string gets an index
+    """
+
+    def __init__(self):
+        self.ids = {}
+
+    def intern(self, text):
+        return self.ids.setdefault(text, len(self.ids))
+
+    def internAll(self, texts):
+        return np.fromiter((self.intern(t) for t in texts), dtype="<u4", count=len(texts))
+
+    def toArray(self):
+        # Names never contain a NUL, it is used as the separator
+        return np.frombuffer("\0".join(self.ids).encode("utf-8"), dtype=np.uint8)
+
+    @staticmethod
+    def decode(array):
+        if not len(array):
+            return []
+        return array.tobytes().decode("utf-8").split("\0")
+
+
+class StringPool:
+    """
+    String table of a save, the strings are decoded when asked for
+    """
+
+    def __init__(self, array):
+        """
+        array: the NUL separated strings (uint8), usually mapped from the file
+        """
+        self.array = array
+        if len(array):
+            ends = np.flatnonzero(array == 0)
+            self.starts = np.concatenate(([0], ends + 1))
+            self.ends = np.concatenate((ends, [len(array)]))
+        else:
+            self.starts = self.ends = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        return self.array[self.starts[index] : self.ends[index]].tobytes().decode("utf-8")
+
+    def decodeAll(self):
+        return StringTable.decode(self.array)
+
+    def decodeMany(self, ids):
+        """
+        Returns the strings of ids, indexable by their id
+        Decodes the whole table at once when most of it is needed
+        """
+        unique = np.unique(ids).tolist()
+        if len(unique) * 4 > len(self):
+            return self.decodeAll()
+        return {i: self[i] for i in unique}
+
+    def rowsOf(self, ids):
+        """
+        Returns, for every string, the first row of ids that refers to it (-1 if none)
+        """
+        rows = np.full(len(self), -1, dtype=np.int64)
+        unique, first = np.unique(ids, return_index=True)
+        rows[unique] = first
+        return rows
+
+
+class LazyNames:
+    """
+    Names of the planets of a save (a sequence), decoded when asked for
+    The PlanetStore turns it into a list before changing it
+    """
+
+    def __init__(self, ids, strings):
+        """
+        ids: index of the name of every planet in strings
+        strings: StringPool of the save
+        """
+        self.ids = ids
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        return self.strings[int(self.ids[index])]
+
+    def __iter__(self):
+        strings = self.strings.decodeAll()
+        return iter([strings[i] for i in self.ids.tolist()])
+
+
+def packQuests(questList):
+    """
+    Converts QuestManager.toDict()["questList"] to an array of QUEST_DTYPE records
+    """
+    records = np.zeros(len(questList), dtype=QUEST_DTYPE)
+    records["id"] = [q["id"] for q in questList]
+    records["reward"] = [q["reward"] for q in questList]
+    records["giver"] = [q["giverId"] for q in questList]
+    records["destination"] = [q["destinationId"] for q in questList]
+    records["type"] = [QUEST_TYPES.index(q["type"]) for q in questList]
+    records["completed"] = [q["completed"] for q in questList]
+    records["epoch"] = [q.get("epoch", 0) for q in questList]
+    return records
+
+
+def unpackQuests(records):
+    """
+    Converts quest records back to the dicts QuestManager.fromDict expects
+    The dtype comes from the header, the records of version 2 have no epoch
+    (their quests are filtered by acceptedQuests)
+    """
+    quests = [
+        {
+            "id": id,
+            "completed": completed,
+            "reward": reward,
+            "giverId": giver,
+            "receiver": None,
+            "type": QUEST_TYPES[type],
+            "destinationId": destination,
+        }
+        for id, reward, giver, destination, type, completed in zip(
+            records["id"].tolist(),
+            records["reward"].tolist(),
+            records["giver"].tolist(),
+            records["destination"].tolist(),
+            records["type"].tolist(),
+            records["completed"].tolist(),
+        )
+    ]
+    if "epoch" in records.dtype.names:
+        for quest, epoch in zip(quests, records["epoch"].tolist()):
+            quest["epoch"] = epoch
+    return quests
+
+
+def unpackQuestsV1(records, strings, rows=None):
+    """
+    Converts the quest records of a version 1 save, which name their planets
+    rows: row of the planet named by every string (see StringPool.rowsOf),
+    given to the dicts as giverRow and destinationRow
+    """
+    if isinstance(strings, StringPool):
+        strings = strings.decodeMany(np.concatenate((records["giver"], records["destination"])))
+    quests = [
+        {
+            "id": id,
+            "completed": completed,
+            "reward": reward,
+            "giver": strings[giver],
+            "receiver": None,
+            "type": QUEST_TYPES[type],
+            "destination": strings[destination],
+        }
+        for id, reward, giver, destination, type, completed in records.tolist()
+    ]
+    if rows is not None and len(records):
+        for quest, giverRow, destinationRow in zip(quests, rows[records["giver"]].tolist(), rows[records["destination"]].tolist()):
+            quest["giverRow"] = giverRow
+            quest["destinationRow"] = destinationRow
+    return quests
+
+
+def acceptedQuests(questList, currentQuestId):
+    """
+    Saves made before the quests were generated on demand (their quests have no epoch)
+    hold the quest of every planet, only the accepted ones (completed or tracked) are kept
+    """
+    return [q for q in questList if "epoch" in q or q["completed"] or q["id"] == currentQuestId]
+
+
+def writeSave(path, data):
+    """
+    Writes save data (same dict as loadSave returns, the planets being a PlanetStore)
+    """
+    strings = StringTable()
+    sections = {}
+    planets = data.get("planets")
+    if planets is not None:
+        n = len(planets)
+        sections["positions"] = planets.positions[:n]
+        sections["radii"] = planets.radii[:n]
+        sections["colors"] = planets.colors[:n]
+        sections["typeIds"] = planets.typeIds[:n]
+        sections["ids"] = planets.ids[:n]
+        sections["nameIds"] = strings.internAll(planets.names)
+    quests = data.get("quests") or {"questList": [], "currentQuestId": None}
+    sections["quests"] = packQuests(quests["questList"])
+    sections["strings"] = strings.toArray()
+
+    header = {key: data[key] for key in HEADER_KEYS if key in data}
+    header["currentQuestId"] = quests["currentQuestId"]
+    header["sections"] = {}
+    offset = 0
+    for name, array in sections.items():
+        array = np.ascontiguousarray(array)
+        sections[name] = array
+        header["sections"][name] = {
+            "dtype": array.dtype.descr if array.dtype.names else array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset = align(offset + array.nbytes)
+    headerBytes = json.dumps(header).encode("utf-8")
+    dataStart = align(PREAMBLE.size + len(headerBytes))
+
+    with open(path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, 0, len(headerBytes)))
+        f.write(headerBytes)
+        for name, array in sections.items():
+            f.seek(dataStart + header["sections"][name]["offset"])
+            f.write(array.tobytes())
+        # On the disk before the file is renamed over the previous save
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def readHeader(f):
+    """
+    Reads the preamble and the header of an open save file
+    Returns (header, offset of the sections)
+    """
+    preamble = f.read(PREAMBLE.size)
+    if len(preamble) < PREAMBLE.size:
+        raise SaveFormatError("truncated file")
+    magic, version, _, headerLength = PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise SaveFormatError("not a save file")
+    if version > VERSION:
+        raise SaveFormatError(f"save version {version} is newer than the game ({VERSION})")
+    header = json.loads(f.read(headerLength).decode("utf-8"))
+    header["version"] = version
+    return header, align(PREAMBLE.size + headerLength)
+
+
+def readMeta(path):
+    """
+    Returns {key: value} for META_KEYS, only reads the preamble and the header of the save
+    """
+    with open(path, "rb") as f:
+        header, _ = readHeader(f)
+    return {key: header.get(key) for key in META_KEYS}
+
+
+def readSections(buffer, header, dataStart):
+    """
+    Returns {name: array} for the sections of a save read in memory
+    """
+    arrays = {}
+    for name, section in header["sections"].items():
+        dtype = np.dtype([tuple(field) for field in section["dtype"]] if isinstance(section["dtype"], list) else section["dtype"])
+        shape = tuple(section["shape"])
+        start = dataStart + section["offset"]
+        count = int(np.prod(shape))
+        # An empty section at the end may start past the file, after its alignment
+        if count == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+            continue
+        if start + count * dtype.itemsize > len(buffer):
+            raise SaveFormatError(f"truncated section {name}")
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=start).reshape(shape)
+    return arrays
+
+
+def readSave(path):
+    """
+    Reads a save written by writeSave
+    Returns the save data, with the planets (if any) in a PlanetStore
+    The file is mapped in memory (copy on write, it is never modified),
+    the planets are views of it and their names are only decoded when used
+    """
+    with open(path, "rb") as f:
+        header, dataStart = readHeader(f)
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    arrays = readSections(mapping, header, dataStart)
+    strings = StringPool(arrays["strings"])
+
+    data = {key: header[key] for key in HEADER_KEYS if key in header}
+    version = header["version"]
+    rows = None
+    if "positions" in arrays:
+        n = len(arrays["positions"])
+        data["planets"] = PlanetStore.fromArrays(
+            arrays["positions"],
+            arrays["radii"],
+            arrays["colors"],
+            arrays["typeIds"],
+            LazyNames(arrays["nameIds"], strings),
+            # Version 1 had no ids, the planets get their row
+            arrays["ids"] if "ids" in arrays else np.arange(n, dtype=np.int64),
+            mapping,
+        )
+        if version < 2 and len(arrays["quests"]):
+            rows = strings.rowsOf(arrays["nameIds"])
+    questList = unpackQuests(arrays["quests"]) if version >= 2 else unpackQuestsV1(arrays["quests"], strings, rows)
+    data["quests"] = {
+        "questList": acceptedQuests(questList, header.get("currentQuestId")),
+        "currentQuestId": header.get("currentQuestId"),
+    }
+    return data
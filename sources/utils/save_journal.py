@@ -0,0 +1,163 @@
+"""
+Save journal
+Append-only file of the changes made since the last full save (the base):
+accepted and completed quests, money transactions and snapshots of the ship.
+Loading a save replays the journal on top of the base, so an autosave only
+costs a few bytes instead of writing the whole world.
+
+Every record is a line of JSON with the generation of the base it applies to.
+A full save starts a new generation, once the base is on the disk the records
+of the older generations are dropped from the journal (compaction)
+"""
+
+import json
+import os
+import threading
+
+# Seconds between two snapshots of the ship
+AUTOSAVE_INTERVAL = 5.0
+
+# Size of the journal (in bytes) above which a full save is written
+COMPACT_SIZE = 64 * 1024
+
+
+class Journal:
+    def __init__(self):
+        # File of the journal, next to the save of the game being journaled
+        self.path = None
+        # Generation of the base the records go on top of, None while no game is journaled
+        self.generation = None
+        self._file = None
+        # Appends (main thread) and compactions (save thread) don't mix
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self._file.tell() if self._file is not None else 0
+
+    def open(self, path, generation=None):
+        """
+        Starts journaling a game
+        path: file of the journal
+        generation: generation of the save the game was loaded from,
+        None for a new game, the old journal is then thrown away
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self.path = path
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "w" if generation is None else "a", encoding="utf-8")
+            self.generation = generation or 0
+
+    def close(self):
+        """
+        Stops journaling, the file stays the one compacted by the running save
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+            self.generation = None
+
+    def record(self, type, **values):
+        """
+        Appends a record, does nothing while no game is journaled
+        It reaches the OS right away, so it survives the game crashing
+        """
+        values["type"] = type
+        # The save thread may be closing or compacting the file, checked under the lock
+        with self._lock:
+            if self._file is None:
+                return
+            values["gen"] = self.generation
+            self._file.write(json.dumps(values, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def rotate(self):
+        """
+        Starts a new generation, returns it to be stored in the new base
+        """
+        self.generation = (self.generation or 0) + 1
+        return self.generation
+
+    def compact(self, generation):
+        """
+        Drops the records older than generation, once its base is written
+        Called from the save thread
+        """
+        with self._lock:
+            if self.path is None:
+                return
+            # The game may have been closed since the save started
+            reopen = self._file is not None
+            if reopen:
+                self._file.close()
+            records = [r for r in readRecords(self.path) if r["gen"] >= generation]
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            os.replace(tmp, self.path)
+            if reopen:
+                self._file = open(self.path, "a", encoding="utf-8")
+
+
+def readRecords(path):
+    """
+    Returns the records of a journal, a line cut by a crash ends it
+    """
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+    return records
+
+
+def replay(path, data):
+    """
+    Applies the records of a journal made on top of a save to its data (see loadSave)
+    Returns the number of records applied
+    """
+    base = data.get("journal", 0)
+    quests = data.setdefault("quests", {"questList": [], "currentQuestId": None})
+    applied = 0
+    for record in readRecords(path):
+        if record.get("gen", -1) < base:
+            continue
+        type = record["type"]
+        if type == "ship":
+            for key in ("pos", "vel", "angle", "zoom", "playtime"):
+                if key in record:
+                    data[key] = record[key]
+        elif type == "money":
+            data["money"] = record["balance"]
+        elif type == "accept":
+            quest = record["quest"]
+            # The quest may have been generated after the base was written
+            quests["questList"] = [q for q in quests["questList"] if q["id"] != quest["id"]]
+            quests["questList"].append(quest)
+            quests["currentQuestId"] = quest["id"]
+            # The chunks of both ends of the quest are kept in the streamed universe
+            if "chunks" in data:
+                for key in record.get("chunks", []):
+                    if key not in data["chunks"]:
+                        data["chunks"].append(key)
+        elif type == "complete":
+            for quest in quests["questList"]:
+                if quest["id"] == record["id"]:
+                    quest["completed"] = True
+            if quests["currentQuestId"] == record["id"]:
+                quests["currentQuestId"] = None
+            # Only the chunks of the quests still active stay kept
+            if "chunks" in data and "chunks" in record:
+                data["chunks"] = record["chunks"]
+        else:
+            continue
+        applied += 1
+    return applied
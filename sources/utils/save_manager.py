@@ -1,10 +1,35 @@
 import gzip
 import json
 import os
+import threading
+import time
 
 import pygame
 
-SAVE_FILE = "savegame.json.gz"
+from utils.save_format import META_KEYS, VERSION, SaveFormatError, acceptedQuests, readMeta, readSave, writeSave
+from utils.save_journal import replay
+
+# Every slot is a save (slot<N>.sav) and its journal (slot<N>.journal, see utils/save_journal.py)
+SAVE_DIR = "saves"
+SLOT_COUNT = 3
+
+# Metadata of every slot, so the menus don't open the saves
+MANIFEST_FILE = os.path.join(SAVE_DIR, "manifest.json")
+
+# Save of the versions without slots, moved to the first slot
+UNSLOTTED_SAVE_FILE = "savegame.sav"
+UNSLOTTED_JOURNAL_FILE = "savegame.journal"
+
+# Save of the older versions of the game, converted to the first slot
+LEGACY_SAVE_FILE = "savegame.json.gz"
+
+
+def slotFile(slot):
+    return os.path.join(SAVE_DIR, f"slot{slot}.sav")
+
+
+def journalFile(slot):
+    return os.path.join(SAVE_DIR, f"slot{slot}.journal")
 
 
 # Util for planets
@@ -12,11 +37,15 @@ def serializePlanet(p):
     return p.toDict()
 
 
-def deserializePlanet(d):
-    return __import__("entities.planet", fromlist=["Planet"]).Planet.fromDict(d)
+def deserializePlanets(planets):
+    return __import__("entities.planet_store", fromlist=["PlanetStore"]).PlanetStore.fromDicts(planets)
 
 
-def saveGame(game):
+def snapshot(game, copy=False):
+    """
+    Returns the save data of the game, the planets are the PlanetStore itself
+    copy: copy the planets, so the data can be written while the game goes on
+    """
     data = {
         "ship": game.selectedShip.name,
         "pos": [game.selectedShip.pos.x, game.selectedShip.pos.y],
@@ -24,26 +53,302 @@ def saveGame(game):
         "angle": game.selectedShip.angle,
         "zoom" : game.gameScreen.zoom,
         "money": game.amount,
-        # Plannets
-        "planets": [serializePlanet(p) for p in game.gameScreen.planets],
         "quests": game.questManager.toDict(),
+        "playtime": game.playtime,
+        "planetCount": len(game.gameScreen.planets),
+        "timestamp": time.time(),
+        "seed": game.gameScreen.seed,
     }
-    with gzip.open(SAVE_FILE, "wb") as f:
-        f.write(json.dumps(data).encode("utf-8"))
-    print("[SaveManager] Game saved (gzipped).")
+    universe = game.gameScreen.universe
+    if universe is not None:
+        # Streamed universe, everything is regenerated from the seed
+        # except the modified chunks
+        data["chunks"] = [list(key) for key in universe.modifiedKeys()]
+    else:
+        # Plannets
+        planets = game.gameScreen.planets
+        # They may be mapped from the file the save is about to replace
+        planets.unmap()
+        data["planets"] = planets.copy() if copy else planets
+    return data
+
+
+def writeSaveAtomic(path, data):
+    """
+    Writes the save next to path then renames it over path,
+    a crash while writing leaves the previous save as it was
+    """
+    tmp = path + ".tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        writeSave(tmp, data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def saveGame(game):
+    data = snapshot(game)
+    writeSaveAtomic(slotFile(game.slot), data)
+    updateManifest(game.slot, metaOf(data))
+    print("[SaveManager] Game saved.")
+
+
+#==============
+#= Save slots =
+#==============
+def metaOf(data):
+    """
+    Returns the metadata of save data, what readMeta reads back from the file
+    """
+    meta = {key: data.get(key) for key in META_KEYS}
+    meta["version"] = VERSION
+    return meta
+
+
+def readManifest():
+    try:
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return {int(slot): meta for slot, meta in json.load(f).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def writeManifest(manifest):
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    tmp = MANIFEST_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({str(slot): meta for slot, meta in sorted(manifest.items())}, f, indent=1)
+    os.replace(tmp, MANIFEST_FILE)
+
 
-def loadSave(game):
-    if not os.path.exists(SAVE_FILE):
-        print("[SaveManager] Can't find savefile")
+def updateManifest(slot, meta):
+    """
+    Sets the metadata of a slot in the manifest (None removes the slot)
+    """
+    manifest = readManifest()
+    if meta is None:
+        manifest.pop(slot, None)
+    else:
+        manifest[slot] = meta
+    writeManifest(manifest)
+
+
+def migrateSaves():
+    """
+    Moves the save of the versions without slots to the first slot
+    """
+    if os.path.exists(slotFile(1)):
+        return
+    if os.path.exists(UNSLOTTED_SAVE_FILE):
+        os.makedirs(SAVE_DIR, exist_ok=True)
+        if os.path.exists(UNSLOTTED_JOURNAL_FILE):
+            os.replace(UNSLOTTED_JOURNAL_FILE, journalFile(1))
+        os.replace(UNSLOTTED_SAVE_FILE, slotFile(1))
+        print(f"[SaveManager] {UNSLOTTED_SAVE_FILE} moved to {slotFile(1)}")
+    elif os.path.exists(LEGACY_SAVE_FILE):
+        # Converted once, the old file is left untouched
+        data = readJsonSave(LEGACY_SAVE_FILE)
+        data["planetCount"] = len(data.get("planets", ()))
+        writeSaveAtomic(slotFile(1), data)
+        print(f"[SaveManager] {LEGACY_SAVE_FILE} converted to {slotFile(1)}")
+
+
+def oldSave(slot):
+    """
+    Returns (save, journal) paths of the save of the older versions that stands for a slot
+    which was not migrated (see migrateSaves), the journal being None for the legacy save
+    None if there is none
+    """
+    if slot != 1 or os.path.exists(slotFile(1)):
         return None
-    with gzip.open(SAVE_FILE, "rb") as f:
+    if os.path.exists(UNSLOTTED_SAVE_FILE):
+        return UNSLOTTED_SAVE_FILE, UNSLOTTED_JOURNAL_FILE
+    if os.path.exists(LEGACY_SAVE_FILE):
+        return LEGACY_SAVE_FILE, None
+    return None
+
+
+def readOldMeta(path):
+    """
+    Returns the metadata of a save of the older versions, without migrating it
+    """
+    if path != LEGACY_SAVE_FILE:
+        return readMeta(path)
+    data = readJsonSave(path)
+    data["planetCount"] = len(data.get("planets", ()))
+    return metaOf(data)
+
+
+def listSaves(migrate=True):
+    """
+    Returns {slot: metadata} of the slots that have a save
+    Comes from the manifest, only the saves missing from it are opened (header only)
+    migrate: migrates the saves of the older versions and rewrites the manifest when outdated,
+             if False nothing is written (headless games), the old save is read where it is
+    """
+    if migrate:
+        migrateSaves()
+    manifest = readManifest()
+    saves = {}
+    for slot in range(1, SLOT_COUNT + 1):
+        path, read, meta = slotFile(slot), readMeta, None
+        if os.path.exists(path):
+            meta = manifest.get(slot)
+        else:
+            old = None if migrate else oldSave(slot)
+            if old is None:
+                continue
+            path, read = old[0], readOldMeta
+        if meta is None:
+            try:
+                meta = read(path)
+            except (OSError, ValueError, SaveFormatError) as e:
+                print(f"[SaveManager] Can't read the savefile {path}: {e}")
+                continue
+        saves[slot] = meta
+    if migrate and saves != manifest:
+        writeManifest(saves)
+    return saves
+
+
+class BackgroundSaver:
+    """
+    Writes the saves on a worker thread, the main thread only takes the snapshot
+    A save asked while another one is being written replaces the one waiting,
+    only the latest state is written after the current one
+    """
+
+    def __init__(self, path, onSaved=None):
+        """
+        path: file written, can be changed while no save is running
+        onSaved: called with the save data (on the worker thread) once it is on the disk
+        """
+        self.path = path
+        self.onSaved = onSaved
+        # "idle", "saving", "saved" or "failed", read by the UI (see ui/save_indicator.py)
+        self.status = "idle"
+        self.error = None
+        # time.monotonic() of the end of the last save
+        self.finishedAt = 0.0
+        self._lock = threading.Lock()
+        self._pending = None
+        self._thread = None
+
+    def save(self, data, path=None, onSaved=None):
+        """
+        Queues save data (from snapshot(game, copy=True)) and returns right away
+        path, onSaved: for this save only, self.path and self.onSaved if None,
+        so what the game changes meanwhile doesn't change where the save goes
+        """
+        with self._lock:
+            self._pending = (data, path or self.path, onSaved or self.onSaved)
+            self.status = "saving"
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="BackgroundSaver")
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if pending is None:
+                    self._thread = None
+                    return
+            data, path, onSaved = pending
+            start = time.perf_counter()
+            try:
+                writeSaveAtomic(path, data)
+                if onSaved is not None:
+                    onSaved(data)
+                error = None
+                print(f"[SaveManager] Game saved in {(time.perf_counter() - start) * 1000:.0f} ms.")
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                print(f"[SaveManager] Can't write the savefile: {error}")
+            with self._lock:
+                # A newer save is waiting, keep showing "saving"
+                if self._pending is None:
+                    self.status = "failed" if error else "saved"
+                    self.error = error
+                    self.finishedAt = time.monotonic()
+
+    @property
+    def busy(self):
+        return self._thread is not None
+
+    def wait(self):
+        """
+        Blocks until the queued saves are written (before quitting)
+        """
+        thread = self._thread
+        while thread is not None:
+            thread.join()
+            thread = self._thread
+
+
+def writeJsonSave(path, data):
+    """
+    Writes save data in the old gzipped JSON format
+    """
+    data = dict(data)
+    if "planets" in data:
+        data["planets"] = [serializePlanet(p) for p in data["planets"]]
+    with gzip.open(path, "wb") as f:
+        f.write(json.dumps(data).encode("utf-8"))
+
+
+def readJsonSave(path):
+    """
+    Reads a save of the old gzipped JSON format, the planets are put in a PlanetStore
+    """
+    with gzip.open(path, "rb") as f:
         data = json.loads(f.read().decode("utf-8"))
+    if "planets" in data:
+        data["planets"] = deserializePlanets(data["planets"])
+        # Quests of the old versions name their planets
+        questList = []
+        for quest in data.get("quests", {}).get("questList", []):
+            if "giverId" not in quest:
+                giver = data["planets"].findByName(quest["giver"])
+                destination = data["planets"].findByName(quest["destination"])
+                if giver is None or destination is None:
+                    continue
+                quest = dict(quest, giverId=giver.id, destinationId=destination.id)
+            questList.append(quest)
+        if "quests" in data:
+            data["quests"]["questList"] = acceptedQuests(questList, data["quests"].get("currentQuestId"))
+    return data
+
+
+def loadSave(game, slot=None):
+    """
+    Loads the save of a slot (the slot of the game if None), journal included
+    A slot that was not migrated (headless games) is read from the save of the older versions
+    """
+    slot = game.slot if slot is None else slot
+    path, journal = slotFile(slot), journalFile(slot)
+    if not os.path.exists(path):
+        old = oldSave(slot)
+        if old is None:
+            print("[SaveManager] Can't find savefile")
+            return None
+        path, journal = old
+    try:
+        data = readJsonSave(path) if path == LEGACY_SAVE_FILE else readSave(path)
+    except (OSError, ValueError, KeyError, SaveFormatError) as e:
+        print(f"[SaveManager] Can't read the savefile: {e}")
+        return None
+    # Changes saved since the save was written
+    applied = replay(journal, data) if journal is not None else 0
+    if applied:
+        print(f"[SaveManager] {applied} journal records replayed")
     print("[SaveManager] Save file loaded successfully")
     # Ship
     data["ship"] = game.selectedShip = next(
         (ship for ship in game.availableShips if ship.name == data["ship"]), None
     )
 
-    data["planets"] = [deserializePlanet(p) for p in data["planets"]]
-
     return data
@@ -5,6 +5,8 @@ SETTINGS_FILE = "settings.json"
 
 AVAILABLE_FPS = [1, 30, 60, 120, 144, 240, 360]  # 0 = uncapped
 
+AVAILABLE_TICK_RATES = [30, 60, 120]
+
 AVAILABLE_RESOLUTIONS = [
     (800, 600),
     (1280, 720),
@@ -16,6 +18,7 @@ AVAILABLE_RESOLUTIONS = [
 
 DEFAULT_SETTINGS = {
     "fps": 120,
+    "tickRate": 60,
     "fullscreen": False,
     "resolution": (1280, 720),
 }
@@ -39,6 +42,9 @@ def loadSettings():
                 )
                 settings["resolution"] = DEFAULT_SETTINGS["resolution"]
 
+            if settings.get("tickRate") not in AVAILABLE_TICK_RATES:
+                settings["tickRate"] = DEFAULT_SETTINGS["tickRate"]
+
             print(f"[Settings] Paramètres chargés depuis {SETTINGS_FILE}")
             return settings
         except Exception as e:
@@ -72,6 +78,9 @@ def validateSettings(settings):
     if tuple(validated.get("resolution", ())) not in AVAILABLE_RESOLUTIONS:
         validated["resolution"] = DEFAULT_SETTINGS["resolution"]
 
+    if validated.get("tickRate") not in AVAILABLE_TICK_RATES:
+        validated["tickRate"] = DEFAULT_SETTINGS["tickRate"]
+
     if not isinstance(validated.get("fullscreen"), bool):
         validated["fullscreen"] = DEFAULT_SETTINGS["fullscreen"]
 
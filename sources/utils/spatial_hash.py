@@ -0,0 +1,210 @@
+"""
+Spatial hash
+A uniform grid that buckets the rows of a PlanetStore by their world position,
+so we only look at what is near a point instead of at everything.
+A grid built in bulk keeps its rows sorted by cell in NumPy arrays,
+the cells only become Python lists if the grid is changed afterwards.
+The bulk layout is there for the loading of big saves, where every planet
+is indexed at once before the first frame (see GameScreen.indexPlanets)
+"""
+
+import bisect
+import itertools
+
+import numpy as np
+
+# Revisions are shared by every grid, so a rebuilt grid (which may even reuse
+# the id of the old one) never has a revision a cache already saw
+_revisions = itertools.count(1)
+
+# Rectangles narrower than that (in cells) look their columns up with bisect,
+# wider ones with NumPy, which costs more per call but less per column
+BISECT_COLUMNS = 16
+
+# The cy of the packed keys are shifted by that, so the keys sort like (cx, cy)
+KEY_OFFSET = 2 ** 31
+
+
+def packKey(cx, cy):
+    """
+    Returns the single integer key of a cell (works on arrays too), sorted by cx then cy
+    """
+    return cx * 2 ** 32 + (cy + KEY_OFFSET)
+
+
+class SpatialHash:
+    def __init__(self, store, cellSize=1000):
+        """
+        store: the PlanetStore whose rows are indexed
+        cellSize: size of a grid cell in world units,
+                  should be a few times bigger than the objects stored
+        """
+        self.store = store
+        self.cellSize = cellSize
+        self.cells = {}
+        # Rows of a grid built in bulk (see build): the packed keys of the occupied
+        # cells, the rows sorted by cell, and where the rows of every cell start
+        # Keys and starts are kept as arrays and as lists (see BISECT_COLUMNS)
+        self._keys = None
+        self._rows = None
+        self._starts = None
+        self._keyList = None
+        self._startList = None
+        self.count = 0
+        # Changes on every change, lets the users of the index cache their results
+        self.revision = next(_revisions)
+        # Biggest radius inserted, used to grow the queries so that
+        # an object whose center is in a neighbour cell is not missed
+        self.maxRadius = 0
+
+    def __len__(self):
+        return self.count
+
+    def cellOf(self, x, y):
+        """
+        Returns the (cx, cy) key of the cell containing the world point
+        """
+        return (int(x // self.cellSize), int(y // self.cellSize))
+
+    def cellCount(self):
+        """
+        Returns the number of occupied cells
+        """
+        if self._keys is not None:
+            return len(self._keys)
+        return len(self.cells)
+
+    def _unpack(self):
+        """
+        Turns the arrays of a grid built in bulk into the cells dict, before it is changed
+        """
+        if self._keys is None:
+            return
+        rows = self._rows.tolist()
+        starts = self._startList
+        self.cells = {
+            (key >> 32, (key & 0xFFFFFFFF) - KEY_OFFSET): rows[start:end]
+            for key, start, end in zip(self._keyList, starts[:-1], starts[1:])
+        }
+        self._keys = self._rows = self._starts = self._keyList = self._startList = None
+
+    def insert(self, index):
+        """
+        Adds a row of the store to the grid
+        """
+        self._unpack()
+        x, y = self.store.positions[index]
+        self.cells.setdefault(self.cellOf(x, y), []).append(index)
+        self.count += 1
+        self.revision = next(_revisions)
+        self.maxRadius = max(self.maxRadius, float(self.store.radii[index]))
+
+    def remove(self, index):
+        """
+        Removes a row of the store from the grid,
+        must be called before the row is removed from the store
+        """
+        self._unpack()
+        key = self.cellOf(*self.store.positions[index])
+        bucket = self.cells[key]
+        bucket.remove(index)
+        if not bucket:
+            del self.cells[key]
+        self.count -= 1
+        self.revision = next(_revisions)
+
+    def move(self, old, new):
+        """
+        Follows a row the store moved (see PlanetStore.remove),
+        must be called after the move, when the data is at its new row
+        """
+        self._unpack()
+        bucket = self.cells[self.cellOf(*self.store.positions[new])]
+        bucket[bucket.index(old)] = new
+        self.revision = next(_revisions)
+
+    def clear(self):
+        self.cells = {}
+        self._keys = self._rows = self._starts = self._keyList = self._startList = None
+        self.count = 0
+        self.revision = next(_revisions)
+        self.maxRadius = 0
+
+    @classmethod
+    def build(cls, store, cellSize=1000):
+        """
+        Creates a grid filled with every row of the store
+        The rows are sorted by cell in bulk with NumPy, no list is made per cell
+        """
+        grid = cls(store, cellSize)
+        n = len(store)
+        if n == 0:
+            return grid
+        cells = np.floor(store.positions[:n] / cellSize).astype(np.int64)
+        keys = packKey(cells[:, 0], cells[:, 1])
+        order = np.argsort(keys)
+        keys = keys[order]
+        starts = np.flatnonzero(np.diff(keys)) + 1
+        grid._keys = keys[np.concatenate(([0], starts))]
+        grid._rows = order
+        grid._starts = np.concatenate(([0], starts, [n]))
+        grid._keyList = grid._keys.tolist()
+        grid._startList = grid._starts.tolist()
+        grid.count = n
+        grid.maxRadius = float(store.radii[:n].max())
+        return grid
+
+    def _candidates(self, left, top, right, bottom):
+        """
+        Returns the rows stored in the cells overlapping a world rectangle,
+        or None when the rectangle covers more cells than there are occupied ones
+        (very low zoom), in that case the caller should test every row
+        """
+        cx0, cy0 = self.cellOf(left, top)
+        cx1, cy1 = self.cellOf(right, bottom)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.cellCount():
+            return None
+        if self._keys is not None:
+            # Every column of the rectangle is a contiguous run of cells
+            if cx1 - cx0 < BISECT_COLUMNS:
+                keys, starts = self._keyList, self._startList
+                slices = [
+                    (starts[bisect.bisect_left(keys, packKey(cx, cy0))], starts[bisect.bisect_right(keys, packKey(cx, cy1))])
+                    for cx in range(cx0, cx1 + 1)
+                ]
+            else:
+                columns = np.arange(cx0, cx1 + 1, dtype=np.int64)
+                first = np.searchsorted(self._keys, packKey(columns, cy0), "left")
+                last = np.searchsorted(self._keys, packKey(columns, cy1), "right")
+                slices = zip(self._starts[first].tolist(), self._starts[last].tolist())
+            parts = [self._rows[start:end] for start, end in slices if start < end]
+            if len(parts) == 1:
+                return parts[0]
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        rows = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    rows.extend(bucket)
+        return np.array(rows, dtype=np.int64)
+
+    def queryRadius(self, point, radius):
+        """
+        Returns the rows (array) whose disc overlaps the circle (point, radius)
+        point: world position
+        radius: search radius in world units
+        """
+        px, py = point[0], point[1]
+        reach = radius + self.maxRadius
+        rows = self._candidates(px - reach, py - reach, px + reach, py + reach)
+        return self.store.withinRadius(point, radius, rows)
+
+    def queryRect(self, left, top, width, height):
+        """
+        Returns the rows (array) whose disc overlaps a world rectangle
+        left, top, width, height: the rectangle in world units
+        """
+        reach = self.maxRadius
+        rows = self._candidates(left - reach, top - reach, left + width + reach, top + height + reach)
+        return self.store.inRect(left, top, width, height, rows)